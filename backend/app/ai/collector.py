@@ -1,4 +1,3 @@
-import asyncio
 from services.kis.ranking.market_cap import mkt_cap_service
 from services.kis.ranking.fluctuation import fluct_service
 
@@ -71,7 +70,6 @@ class StockCollector:
                     for item in items[:20]:
                         code = item.get('symb')
                         if code: short_term_set.add(code)
-                    await asyncio.sleep(0.1)
                 except: pass
             
         final_short = short_term_set - long_term_set
@@ -8,7 +8,7 @@ from datetime import datetime, timedelta
 # --- 모듈 경로 설정 ---
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
 
-from services.kis.data import kis_data
+from services.kis.bar_store import bar_store
 from ai.models import StockLSTM
 import asyncio
 
@@ -59,7 +59,7 @@ class AiPredictor:
         start_dt = (datetime.now() - timedelta(days=150)).strftime("%Y%m%d")
 
         try:
-            data = await kis_data.get_stock_chart(api_market, code, "D", start_dt, end_dt)
+            data = await bar_store.get_chart(api_market, code, start_dt, end_dt)
             if not data or len(data) < SEQ_LENGTH:
                 return {"error": "데이터 부족 (신규 상장주거나 데이터 누락)"}
         except Exception as e:
@@ -10,7 +10,10 @@ import joblib
 import os 
 import time
 
-from services.kis.data import kis_data
+from services.kis.bar_store import bar_store
+from services.kis.ranking.market_cap import mkt_cap_service
+from services.kis.rate_limit import set_request_priority, PRIORITY_BATCH
+from services.kis.exchange_rate import exchange_rate_service
 from ai.models import StockLSTM
 from ai.utils import add_indicators
 
@@ -46,9 +49,7 @@ async def run_training(market_name, stock_list, model_file, scaler_file):
         if idx % 10 == 0:
             print(f"[{idx+1}/{len(stock_list)}] {stock['name']} 수집 중...")
             
-        await asyncio.sleep(0.01) # 딜레이 최소화
-        
-        chart_data = await kis_data.get_stock_chart(stock['market'], stock['code'], "D")
+        chart_data = await bar_store.get_chart(stock['market'], stock['code'])
         if not chart_data or len(chart_data) < 250: continue
             
         df = pd.DataFrame(chart_data)
@@ -173,10 +174,15 @@ async def run_training(market_name, stock_list, model_file, scaler_file):
     torch.save(model.state_dict(), os.path.join(BASE_DIR, model_file))
 
 async def main():
+    # 학습 데이터 수집은 배치 우선순위로 호출 (사용자 요청 몫을 침범하지 않도록)
+    set_request_priority(PRIORITY_BATCH)
+    # 해외 시세 원화 환산용 환율 (앱 lifespan 밖에서 실행되므로 직접 1회 조회)
+    await exchange_rate_service.refresh()
+
     # 국내
     kr_list = []
     try:
-        ranks = await kis_data.get_ranking_data("cap")
+        ranks = (await mkt_cap_service.get_domestic()).get("output", [])
         limit = 200 if len(ranks) > 200 else len(ranks)
         for item in ranks[:limit]:
             kr_list.append({"market": "KR", "code": item['code'], "name": item['name']})
@@ -187,7 +193,7 @@ async def main():
     # 나스닥
     nas_list = []
     try:
-        ranks = await kis_data.get_overseas_ranking_data("market_cap", "NAS")
+        ranks = (await mkt_cap_service.get_overseas("NAS")).get("output", [])
         limit = 200 if len(ranks) > 200 else len(ranks)
         for item in ranks[:limit]:
             nas_list.append({"market": "NAS", "code": item['code'], "name": item.get('name', item['code'])})
@@ -12,7 +12,9 @@ from torch.utils.data import DataLoader, TensorDataset
 # --- 모듈 경로 설정 ---
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
 
-from services.kis.data import kis_data
+from services.kis.bar_store import bar_store
+from services.kis.rate_limit import set_request_priority, PRIORITY_BATCH
+from services.kis.exchange_rate import exchange_rate_service
 from ai.models import StockLSTM
 from ai.collector import collector
 import models 
@@ -29,34 +31,16 @@ DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
 
 # --- 1. 데이터 수집 함수 ---
 async def fetch_stock_data_paginated(market, code, years):
-    all_data = []
+    # 로컬 일봉 저장소에서 조회 (저장된 구간 밖만 KIS에서 페이지 단위로 받아 추가)
     end_dt = datetime.now()
     start_dt = end_dt - timedelta(days=years * 365)
-    
-    end_str = end_dt.strftime("%Y%m%d")
-    start_target_str = start_dt.strftime("%Y%m%d")
-    current_end_str = end_str
-    
-    for _ in range(15):
-        try:
-            chunk = await kis_data.get_stock_chart(
-                market, code, "D", 
-                start_date=start_target_str, 
-                end_date=current_end_str
-            )
-            if not chunk: break
-            
-            all_data = chunk + all_data 
-            oldest_date = chunk[0]['time']
-            
-            if oldest_date <= start_target_str: break
-            
-            current_end_str = oldest_date
-            await asyncio.sleep(0.2)
-        except Exception as e:
-            print(f"Fetch error {code}: {e}")
-            break
-    
+
+    try:
+        all_data = await bar_store.get_chart(market, code, start_dt.strftime("%Y%m%d"), end_dt.strftime("%Y%m%d"))
+    except Exception as e:
+        print(f"Fetch error {code}: {e}")
+        return None
+
     if not all_data: return None
     df = pd.DataFrame(all_data)
     df = df.drop_duplicates(subset=['time']).sort_values('time').reset_index(drop=True)
@@ -208,6 +192,11 @@ def train_and_save(model_name, X_data, y_data, w_data):
 
 # --- 메인 실행 함수 ---
 async def main():
+    # 학습 데이터 수집은 배치 우선순위로 호출 (사용자 요청 몫을 침범하지 않도록)
+    set_request_priority(PRIORITY_BATCH)
+    # 해외 시세 원화 환산용 환율 (앱 lifespan 밖에서 실행되므로 직접 1회 조회)
+    await exchange_rate_service.refresh()
+
     # ---------------------------------------------------------
     # 1. KR (한국 주식) - 이원화 적용
     # ---------------------------------------------------------
@@ -1,6 +1,7 @@
 import os
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict, List
 
 class Settings(BaseSettings):
     # URL & URI
@@ -21,6 +22,79 @@ class Settings(BaseSettings):
 
     TWELVEDATA_API_KEY: str
 
+    # KIS HTTP Client (커넥션 풀)
+    KIS_HTTP2: bool = True
+    KIS_HTTP_MAX_CONNECTIONS: int = 50
+    KIS_HTTP_MAX_KEEPALIVE: int = 20
+    KIS_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    KIS_HTTP_TIMEOUT: float = 10.0
+    KIS_ENDPOINT_TIMEOUTS: Dict[str, float] = {} # 경로 일부별 타임아웃 (예: {"/quotations/inquire-price": 2.0})
+
+    # KIS 호출 재시도 / 서킷 브레이커
+    KIS_RETRY_MAX: int = 2
+    KIS_RETRY_BACKOFF_BASE: float = 0.2
+    KIS_RETRY_BACKOFF_MAX: float = 2.0
+    KIS_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    KIS_CIRCUIT_RESET_TIMEOUT: float = 30.0
+    KIS_STALE_CACHE_SIZE: int = 1000 # 서킷이 열렸을 때 대신 제공할 마지막 정상 응답 수
+
+    # KIS 호출 속도 제한 (초당 호출 수)
+    KIS_RATE_LIMIT_PER_SEC: float = 18.0
+    KIS_RATE_LIMIT_BURST: float = 18.0
+    KIS_BATCH_RATE_SHARE: float = 0.5 # 배치 작업이 사용할 수 있는 최대 비율
+    KIS_TR_RATE_LIMITS: Dict[str, float] = {} # TR ID별 한도, 앱키마다 따로 적용 (예: {"HHDFS76240000": 5})
+    KIS_APP_RATE_LIMITS: Dict[str, float] = {} # 앱키별 초당 한도 (지정하지 않은 앱키는 KIS_RATE_LIMIT_PER_SEC / BURST)
+
+    # KIS 실시간 웹소켓
+    KIS_WS_MAX_SUBSCRIPTIONS: int = 41 # 세션(approval key)당 실시간 등록 가능 종목 수
+    KIS_WS_EXTRA_APP_KEYS: List[Dict[str, str]] = [] # 추가 세션용 앱키 (예: [{"app_key": "...", "secret_key": "..."}])
+    KIS_WS_RECONNECT_BASE: float = 1.0 # 재연결 백오프 시작 (초)
+    KIS_WS_RECONNECT_MAX: float = 30.0 # 재연결 백오프 최대 (초)
+    KIS_WS_DECRYPT_WORKERS: int = 2 # 암호화 프레임 복호화 스레드 수
+    KIS_WS_DECRYPT_INLINE_BYTES: int = 65536 # 이 크기 이하의 암호화 프레임은 스레드 풀을 거치지 않고 바로 복호화
+    KIS_WS_UNSUBSCRIBE_LINGER: float = 10.0 # 마지막 구독자가 떠난 뒤 KIS 구독 해제까지 대기 (초)
+
+    # 실시간 중계 (클라이언트별 송신 큐)
+    WS_CLIENT_QUEUE_SIZE: int = 256
+    WS_CLIENT_OVERFLOW_POLICY: str = "conflate" # drop_oldest / conflate / disconnect
+    WS_MAX_RANKING_KEYS: int = 8 # 연결당 구독 가능한 순위 수
+    WS_CONFLATE_MS: int = 0 # 체결/호가 병합 주기 (0: 병합 없음). 연결 시 conflate_ms 쿼리로 변경 가능
+
+    # 현재가 캐시 (TTL 단위: 초)
+    QUOTE_CACHE_MAX_SIZE: int = 2000
+    QUOTE_CACHE_TTL_OPEN: float = 2.0
+    QUOTE_CACHE_TTL_CLOSED: float = 300.0
+
+    # 실시간 체결 내역 버퍼 (종목별 최근 체결)
+    TICK_BUFFER_SIZE: int = 1000
+    TICK_STORE_MAX_SYMBOLS: int = 500
+
+    # 실시간 분봉 (체결로 만드는 1/3/5/15/60분봉)
+    CANDLE_MAX_BARS: int = 500 # 종목·주기별 보관 봉 수
+    CANDLE_STORE_MAX_SYMBOLS: int = 500
+
+    # 일봉 로컬 저장소 (종목별 NPZ 파일)
+    BAR_STORE_DIR: str = "" # 비워 두면 backend/data/bars
+    BAR_STORE_MAX_MEMORY: int = 200 # 메모리에 올려 두는 종목 수
+    BAR_STORE_MAX_PAGES: int = 40 # 한 번의 동기화에서 받는 최대 페이지 수 (페이지당 약 100건)
+    BAR_STORE_WINDOW_DAYS: int = 140 # 페이지 1개로 요청하는 구간 (달력 일수, 100거래일 이내)
+    BAR_STORE_FETCH_CONCURRENCY: int = 4 # 구간 동시 요청 수
+    BAR_STORE_LISTING_EMPTY_WINDOWS: int = 4 # 빈 구간이 연속 이만큼이면 상장 전으로 판단 (그 미만은 거래정지로 보고 계속 조회)
+    BAR_STORE_CHART_MAX_YEARS: int = 20 # 차트로 조회하는 최대 과거 구간 (년)
+    BAR_STORE_CHART_SYNC_DAYS: int = 365 # 차트 요청에서 응답 전에 받는 과거 구간 (달력 일수). 더 과거는 백그라운드로 받음
+    BAR_STORE_REFRESH_OPEN: float = 300.0 # 장중 최신 구간 재동기화 주기 (초)
+    BAR_STORE_REFRESH_CLOSED: float = 3600.0 # 장 마감 후 재동기화 주기 (초)
+
+    # 순위 캐시 (stale-while-revalidate, 단위: 초)
+    RANKING_CACHE_REFRESH_AFTER: float = 5.0 # 이 시간이 지나면 백그라운드 갱신
+    RANKING_CACHE_MAX_AGE: float = 600.0 # 이 시간보다 오래된 스냅샷은 사용하지 않음
+    RANKING_POLL_INTERVAL_OPEN: float = 5.0 # 장중 백그라운드 갱신 주기
+    RANKING_POLL_INTERVAL_CLOSED: float = 60.0 # 장 마감 후 백그라운드 갱신 주기
+
+    # 환율 (USD/KRW)
+    FX_API_URL: str = "https://open.er-api.com/v6/latest/USD"
+    FX_REFRESH_INTERVAL: float = 900.0 # 초
+
     KAKAO_CLIENT_ID: str
     KAKAO_CLIENT_SECRET: str
 
@@ -4,6 +4,10 @@ from contextlib import asynccontextmanager
 
 from .database import init_db, engine
 from services.kis.auth import kis_auth
+from services.kis.client import kis_client
+from services.kis.exchange_rate import exchange_rate_service
+from services.kis.ranking.poller import ranking_poller
+from services.kis.websocket import kis_ws_manager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,6 +18,8 @@ async def lifespan(app: FastAPI):
     logger.info("✅ FastAPI 앱이 시작됩니다.")
 
     await init_db()
+    await kis_client.start()
+    await exchange_rate_service.start()
 
     try:
         logger.info("🔑 KIS Access Token 발급/갱신을 시도합니다.")
@@ -27,9 +33,15 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"⛔ 앱 시작 중 KIS 토큰 발급/저장 실패: {e}", exc_info=True)
 
+    await ranking_poller.start()
+
     # --- 앱 종료 ---
     yield
     logger.info("✅ FastAPI 앱이 종료됩니다.")
+    await ranking_poller.stop()
+    await kis_ws_manager.close()
+    await exchange_rate_service.stop()
+    await kis_client.close()
     if engine:
         logger.info("✅ 데이터베이스 엔진 연결을 종료합니다.")
         await engine.dispose()
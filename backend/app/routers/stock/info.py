@@ -1,11 +1,26 @@
+import datetime
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 
 from services.kis.stock_info import stock_info_service
 from services.kis.data import kis_data
+from services.kis.bar_store import bar_store, parse_period
 
 router = APIRouter(prefix="/stocks", tags=["Stocks Info"])
 
+DEFAULT_CHART_BARS = 100 # 기간 지정이 없을 때 봉 개수 (KIS 1페이지와 동일)
+MAX_CHART_BARS = 1000
+
+def is_valid_date(value: str) -> bool:
+    """YYYYMMDD 형식의 실제 날짜인지 (예: 20241399는 False)"""
+    if len(value) != 8 or not value.isdigit():
+        return False
+    try:
+        datetime.datetime.strptime(value, "%Y%m%d")
+    except ValueError:
+        return False
+    return True
+
 @router.get("/detail")
 async def read_stock_detail(
     code: str,
@@ -53,18 +68,38 @@ async def read_overseas_stock_conclusion(
 async def get_stock_chart(
     code: str,
     market: str = Query(..., description="'domestic' or 'overseas'"),
-    period: str = Query("D", description="D(일), W(주), M(월)")
+    period: str = Query("D", description="D(일), W(주), M(월), Y(년), ND(N거래일, 예: 5D), Nm(N분)"),
+    start: Optional[str] = Query(None, description="조회 시작일 (YYYYMMDD)"),
+    end: Optional[str] = Query(None, description="조회 종료일 (YYYYMMDD)"),
+    cursor: Optional[str] = Query(None, description="이전 응답의 next_cursor (더 과거 구간 조회)"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_CHART_BARS, description="봉 개수"),
 ):
     """
     주식 차트 데이터를 조회합니다.
+    start / end / cursor / limit 중 하나라도 지정하면 {"output": [...], "next_cursor": ...} 형식으로 반환합니다.
     """
     # market 값이 'domestic'/'overseas'로 들어오면 KR/NAS 등으로 변환
     target_market = "KR" if market == "domestic" else "NAS"
-    
-    # KIS 서비스 호출
+    paged = any(value is not None for value in (start, end, cursor, limit))
+
+    for value in (start, end, cursor):
+        if value is not None and not is_valid_date(value):
+            raise HTTPException(status_code=400, detail="날짜는 YYYYMMDD 형식이어야 합니다.")
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start는 end보다 늦을 수 없습니다.")
+
+    # 일/주/월/년봉은 로컬 일봉 저장소에서 (주기 변경은 KIS 호출 없이 일봉을 묶어서 계산)
+    if parse_period(period):
+        if paged:
+            return await bar_store.get_chart_page(target_market, code, period, start, end, cursor, limit or DEFAULT_CHART_BARS)
+        return await bar_store.get_chart(target_market, code, limit=DEFAULT_CHART_BARS, period=period)
+
+    # KIS 서비스 호출 (분봉은 당일 구간만 제공)
     result = await kis_data.get_stock_chart(target_market, code, period)
     
     if not result:
-        return []
-        
-    return result
\ No newline at end of file
+        result = []
+
+    if paged:
+        return {"output": result[-limit:] if limit else result, "next_cursor": None}
+    return result
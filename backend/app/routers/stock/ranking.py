@@ -1,56 +1,40 @@
-from fastapi import APIRouter, Query
-from services.kis.ranking.volume import volume_service
-from services.kis.ranking.amount import amount_service
-from services.kis.ranking.market_cap import mkt_cap_service
-from services.kis.ranking.fluctuation import fluct_service
+from fastapi import APIRouter, HTTPException, Query
+from services.kis.ranking.cache import ranking_cache
+from services.kis.ranking.poller import ranking_key, ranking_loader
 
 router = APIRouter(prefix="/stocks/ranking", tags=["Stocks Ranking"])
 
 LIMIT = 30
 
 def slice_output(data: dict, limit: int = LIMIT):
-    """공통 출력 슬라이싱 함수"""
+    """공통 출력 슬라이싱 함수 (캐시된 원본은 수정하지 않음)"""
     if not data:
         return data
     if "output" in data:
-        data["output"] = data["output"][:limit]
+        return {**data, "output": data["output"][:limit]}
     return data
 
+async def get_ranking(ranking: str, market: str, excd: str, direction: str = None):
+    """순위 캐시 조회 (백그라운드 폴러와 같은 키를 공유)"""
+    key = ranking_key(ranking, market, excd, direction)
+    if key is None:
+        raise HTTPException(status_code=400, detail="지원하지 않는 시장(domestic / overseas / all), 거래소코드 또는 방향(rising / falling)입니다.")
+    return slice_output(await ranking_cache.get(key, ranking_loader(key)))
+
 @router.get("/{market}/volume")
 async def get_volume_rank(market: str, excd: str = Query("NAS", description="해외거래소코드")):
     """거래량 순위 (market: domestic / overseas / all)"""
-    if market == "domestic":
-        data = await volume_service.get_domestic()
-    elif market == "overseas":
-        data = await volume_service.get_overseas(excd)
-    else:
-        data = await volume_service.get_combined(excd)
-
-    return slice_output(data)
+    return await get_ranking("volume", market, excd)
 
 @router.get("/{market}/amount")
 async def get_amount_rank(market: str, excd: str = Query("NAS")):
     """거래대금 순위 (market: domestic / overseas / all)"""
-    if market == "domestic":
-        data = await amount_service.get_domestic()
-    elif market == "overseas":
-        data = await amount_service.get_overseas(excd)
-    else:
-        data = await amount_service.get_combined(excd)
-
-    return slice_output(data)
+    return await get_ranking("amount", market, excd)
 
 @router.get("/{market}/market-cap")
 async def get_market_cap_rank(market: str, excd: str = Query("NAS")):
     """시가총액 순위 (market: domestic / overseas / all)"""
-    if market == "domestic":
-        data = await mkt_cap_service.get_domestic()
-    elif market == "overseas":
-        data = await mkt_cap_service.get_overseas(excd)
-    else:
-        data = await mkt_cap_service.get_combined(excd)
-
-    return slice_output(data)
+    return await get_ranking("market-cap", market, excd)
 
 @router.get("/{market}/fluctuation/{direction}")
 async def get_fluctuation_rank(market: str, direction: str, excd: str = Query("NAS")):
@@ -58,11 +42,4 @@ async def get_fluctuation_rank(market: str, direction: str, excd: str = Query("N
     급상승/급하락 순위
     direction: rising (급상승), falling (급하락)
     """
-    if market == "domestic":
-        data = await fluct_service.get_domestic(type=direction)
-    elif market == "overseas":
-        data = await fluct_service.get_overseas(excd=excd, type=direction)
-    else:
-        data = await fluct_service.get_combined(excd=excd, type=direction)
-
-    return slice_output(data)
\ No newline at end of file
+    return await get_ranking("fluctuation", market, excd, direction)
@@ -1,32 +1,24 @@
-import datetime
+import math
 import logging
-import asyncio
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from typing import Optional
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 
+from core.config import settings
 from services.kis.websocket import kis_ws_manager
+from services.kis.relay import ClientSendQueue, COMPACT_SCHEMA
 from services.kis.stock_search import stock_search_service
 from services.kis.stock_info import stock_info_service
+from services.kis.market_hours import is_market_open
+from services.kis.ranking.poller import ranking_poller, ranking_key
+from services.kis.candle_store import candle_store, parse_interval
+from services.kis.data import kis_data
 
 router = APIRouter(prefix="/stocks/ws", tags=["Stocks WebSocket"])
 logger = logging.getLogger(__name__)
 
 # --- Helper Functions (유지) ---
-def is_korea_market_open():
-    now = datetime.datetime.now()
-    if now.hour < 9: return False
-    if now.hour == 15 and now.minute > 30: return False
-    if now.hour >= 16: return False
-    return True
-
-def is_us_market_open():
-    now = datetime.datetime.now()
-    hour = now.hour
-    return (hour >= 23 or hour < 6)
-
 def check_market_open(item):
-    if item["market"] == "domestic":
-        return is_korea_market_open()
-    return is_us_market_open()
+    return is_market_open(item["market"])
 
 DOMESTIC_TICK_TR_ID = "H0STCNT0"
 DOMESTIC_ASK_TR_ID = "H0STASP0"
@@ -40,6 +32,24 @@ def detect_tr_id(market: str, data_type: str = "tick"):
     else:
         return OVERSEAS_ASK_TR_ID if data_type == "ask" else OVERSEAS_TICK_TR_ID
 
+def build_subscription(item: dict):
+    """클라이언트 구독 항목 {code, market, type, excd} → KIS 구독 키 {tr_id, tr_key}"""
+    market_type = item.get("market", "domestic")
+    code = item["code"]
+
+    # 클라이언트 요청에 있는 type ("tick" 또는 "ask")을 사용
+    tr_id = detect_tr_id(market_type, item.get("type", "tick"))
+    tr_key = code
+
+    if market_type == "overseas":
+        if len(code) >= 5 and code[0] in ['D', 'R']:
+            tr_key = code
+        else:
+            exch_code = item.get("excd", "NAS")
+            tr_key = f"D{exch_code}{code}"
+
+    return {"tr_id": tr_id, "tr_key": tr_key}
+
 def get_market_type(market_code: str):
     if market_code in ["KOSPI", "KOSDAQ"]:
         return "domestic"
@@ -47,74 +57,142 @@ def get_market_type(market_code: str):
 
 # --- WebSocket Endpoint ---
 @router.websocket("/realtime")
-async def ws_realtime(websocket: WebSocket):
+async def ws_realtime(
+    websocket: WebSocket,
+    conflate_ms: Optional[int] = Query(None, description="체결/호가 병합 주기 (ms)"),
+    wire_format: str = Query("json", alias="format", description="실시간 데이터 전송 형식 (json / compact)"),
+):
     await websocket.accept()
 
-    async def push_to_client(data):
-        try:
-            await websocket.send_json({ "type": "realtime", "data": data })
-        except Exception:
-            pass 
+    # 전송은 클라이언트별 송신 큐가 담당 (느린 클라이언트가 KIS 수신 루프를 막지 않도록)
+    outbox = ClientSendQueue(websocket, conflate_ms=conflate_ms, wire_format=wire_format)
+    outbox.start()
+    if outbox.wire_format == "compact":
+        outbox.push(COMPACT_SCHEMA)
+
+    push_to_client = outbox.push
+    push_ranking = outbox.push
+    # KIS 연결이 끊겼다가 복구되는 동안 {"type": "status", "state": "reconnecting" / "connected"} 전송
+    kis_ws_manager.set_status_hook(push_to_client, outbox.push)
 
-    kis_ws_manager.add_client(push_to_client)
+    watched = set()  # subscribe 메시지로 구독한 종목 (tr_id, tr_key)
+    search_subs = []  # 직전 검색 결과로 구독한 종목
+    candle_subs = {}  # 분봉 구독: (tr_id, tr_key) → 구독 중인 주기(분) 목록
+    ranking_subs = set()  # 구독 중인 순위 키
+
+    # 분봉만 구독한 종목도 KIS 체결 구독이 유지되도록 등록하는 콜백 (체결 데이터는 전송하지 않음)
+    def candle_feed(message):
+        pass
 
     try:
         while True:
             msg = await websocket.receive_json()
             msg_type = msg.get("type", "subscribe")
 
-            # [CASE 1] 일반 구독 요청
-            if msg_type == "subscribe":
-                items = msg.get("items", [])
-                subscribe_list = []
-                
-                for i in items:
-                    market_type = i.get("market", "domestic")
-                    code = i.get("code")
-                    if not code: continue
-
-                    # [수정된 부분] 클라이언트 요청에 있는 type ("tick" 또는 "ask")을 사용
-                    req_type = i.get("type", "tick") 
-                    tr_id = detect_tr_id(market_type, req_type)
-                    
-                    tr_key = code
+            # [CASE 1] 일반 구독 / 구독 해제 요청
+            if msg_type in ("subscribe", "unsubscribe"):
+                items = [build_subscription(i) for i in msg.get("items", []) if i.get("code")]
+                if not items: continue
+
+                if msg_type == "unsubscribe":
+                    for item in items:
+                        watched.discard((item["tr_id"], item["tr_key"]))
+                    # 같은 콜백으로 등록되어 있으므로, 현재 검색 결과로도 보고 있는 종목은 해제하지 않음
+                    search_keys = set((i["tr_id"], i["tr_key"]) for i in search_subs)
+                    kis_ws_manager.unsubscribe_items(
+                        [i for i in items if (i["tr_id"], i["tr_key"]) not in search_keys], push_to_client
+                    )
+                    continue
 
-                    if market_type == "overseas":
-                        if len(code) >= 5 and code[0] in ['D', 'R']:
-                            tr_key = code 
-                        else:
-                            exch_code = i.get("excd", "NAS") 
-                            tr_key = f"D{exch_code}{code}"
+                for item in items:
+                    watched.add((item["tr_id"], item["tr_key"]))
+                await kis_ws_manager.subscribe_items(items, push_to_client)
 
-                    subscribe_list.append({"tr_id": tr_id, "tr_key": tr_key})
-                
-                if subscribe_list:
-                    await kis_ws_manager.subscribe_items(subscribe_list)
+            # 연결 옵션 변경 (예: {"type": "options", "conflate_ms": 250})
+            elif msg_type == "options":
+                if "conflate_ms" in msg:
+                    conflate = msg["conflate_ms"] or 0 # null / 0: 병합 없음
+                    # 숫자가 아닌 값(문자열, NaN 등)은 무시 (연결은 유지)
+                    if isinstance(conflate, bool) or not isinstance(conflate, (int, float)) or not math.isfinite(conflate):
+                        logger.warning(f"⚠️ 잘못된 conflate_ms 값을 무시합니다: {conflate!r}")
+                        continue
+                    outbox.set_conflation(conflate)
+
+            # [CASE 2] 순위 구독 요청
+            # 최초 1회 전체 스냅샷(full), 이후 폴러가 바뀐 순위만(changes) 전송
+            elif msg_type in ("subscribe_ranking", "unsubscribe_ranking"):
+                key = ranking_key(msg.get("ranking", "volume"), msg.get("market", "all"), msg.get("excd", "NAS"), msg.get("direction"))
+                if key is None: continue
+
+                if msg_type == "unsubscribe_ranking":
+                    ranking_poller.unsubscribe(key, push_ranking)
+                    ranking_subs.discard(key)
+                    continue
 
-            # [CASE 2] 검색 요청 (기존 코드 유지)
+                # 연결당 순위 구독 수 제한 (키마다 백그라운드 폴링이 추가되므로)
+                if key not in ranking_subs and len(ranking_subs) >= settings.WS_MAX_RANKING_KEYS:
+                    logger.warning(f"⚠️ 순위 구독 수 초과로 요청을 무시합니다. (최대 {settings.WS_MAX_RANKING_KEYS}개)")
+                    continue
+                ranking_subs.add(key)
+
+                snapshot = await ranking_poller.subscribe(key, push_ranking)
+                outbox.push(snapshot)
+
+            # 분봉 구독 요청 (예: {"type": "subscribe_candle", "code": "005930", "market": "domestic", "period": "1m"})
+            # 최초 1회 전체 분봉(full), 이후 체결마다 갱신된 봉(bar) 전송
+            elif msg_type in ("subscribe_candle", "unsubscribe_candle"):
+                interval = parse_interval(msg.get("period", "1m"))
+                if interval is None or not msg.get("code"): continue
+                market_type = msg.get("market", "domestic")
+                item = build_subscription({**msg, "type": "tick"})
+                route_key = (item["tr_id"], item["tr_key"])
+                symbol = item["tr_key"] if market_type == "domestic" else item["tr_key"][4:]
+
+                if msg_type == "unsubscribe_candle":
+                    candle_store.unsubscribe(market_type, symbol, interval, push_to_client)
+                    intervals = candle_subs.get(route_key, set())
+                    intervals.discard(interval)
+                    if not intervals and candle_subs.pop(route_key, None) is not None:
+                        kis_ws_manager.unsubscribe_items([item], candle_feed)
+                    continue
+
+                if route_key not in candle_subs:
+                    await kis_ws_manager.subscribe_items([item], candle_feed)
+                candle_subs.setdefault(route_key, set()).add(interval)
+                candle_store.subscribe(market_type, symbol, interval, push_to_client)
+
+                target_market = "KR" if market_type == "domestic" else "NAS"
+                bars = await kis_data.get_stock_chart(target_market, item["tr_key"], f"{interval}m")
+                # 구독 직후에는 아직 체결이 없어 분봉이 없으므로, 받은 REST 분봉으로 직접 채워 실시간 봉이 과거 구간에 이어지도록 함
+                seeded = candle_store.seed(market_type, symbol, interval, bars or [], create=True)
+                if seeded is not None:
+                    bars = seeded
+                outbox.push({
+                    "type": "candle",
+                    "market": market_type,
+                    "code": symbol.upper(),
+                    "period": f"{interval}m",
+                    "full": True,
+                    "output": bars,
+                })
+
+            # [CASE 3] 검색 요청 (기존 코드 유지)
             elif msg_type == "search":
                 keyword = msg.get("keyword")
                 if not keyword: continue
 
                 candidates = stock_search_service.search_stocks(keyword, limit=20)
                 if not candidates:
-                    await websocket.send_json({ "type": "search_result", "data": [] })
+                    outbox.push({ "type": "search_result", "data": [] })
                     continue
 
-                tasks = []
-                domestic_markets = ["KOSPI", "KOSDAQ"]
-                for stock in candidates:
-                    if stock['market'] in domestic_markets:
-                        tasks.append(stock_info_service._get_domestic_stock(stock['code']))
-                    else:
-                        tasks.append(stock_info_service._get_overseas_stock(stock['code'], exchange=stock['market']))
-                
-                prices = await asyncio.gather(*tasks)
+                quotes = await stock_info_service.get_quotes(candidates)
 
                 results = []
                 new_subs = []
 
-                for stock, price_data in zip(candidates, prices):
+                for stock in candidates:
+                    price_data = quotes.get(stock['code'])
                     m_code = stock['market']
                     m_type = get_market_type(m_code)
                     m_label = "국내" if m_type == "domestic" else "해외"
@@ -147,10 +225,16 @@ async def ws_realtime(websocket: WebSocket):
                     
                     new_subs.append({"tr_id": tr_id, "tr_key": tr_key})
 
-                await websocket.send_json({ "type": "search_result", "data": results })
+                outbox.push({ "type": "search_result", "data": results })
+
+                # 새 검색 결과로 구독을 교체 (이전 검색 종목 중 별도로 구독한 종목은 유지)
+                new_keys = set((i["tr_id"], i["tr_key"]) for i in new_subs)
+                stale_subs = [i for i in search_subs if (i["tr_id"], i["tr_key"]) not in new_keys | watched]
+                kis_ws_manager.unsubscribe_items(stale_subs, push_to_client)
+                search_subs = new_subs
 
                 if new_subs:
-                    await kis_ws_manager.subscribe_items(new_subs)
+                    await kis_ws_manager.subscribe_items(new_subs, push_to_client)
 
     except WebSocketDisconnect:
         logger.info("Client disconnected")
@@ -162,30 +246,31 @@ async def ws_realtime(websocket: WebSocket):
             pass
     finally:
         kis_ws_manager.remove_client(push_to_client)
+        kis_ws_manager.remove_client(candle_feed)
+        ranking_poller.remove_listener(push_ranking)
+        candle_store.remove_listener(push_to_client)
+        await outbox.close()
 
 @router.websocket("/ws/stocks/{market}/{code}")
-async def websocket_endpoint(websocket: WebSocket, market: str, code: str):
+async def websocket_endpoint(websocket: WebSocket, market: str, code: str, conflate_ms: Optional[int] = Query(None)):
     await websocket.accept()
     
-    # 1. 클라이언트별 콜백 함수 정의 (필터링 로직 포함)
-    async def client_callback(data: dict):
-        # 파싱된 데이터의 코드가 현재 연결된 코드와 일치할 때만 전송
-        if data.get("code") == code:
-            await websocket.send_json(data)
-
-    # 2. Manager에 콜백 등록 (브로드캐스트 수신 대기)
-    kis_ws_manager.add_client(client_callback)
+    # 1. 클라이언트별 콜백 함수 정의 (Manager가 해당 종목 데이터만 전달, 전송은 송신 큐가 담당)
+    outbox = ClientSendQueue(websocket, conflate_ms=conflate_ms, wire_format="raw")
+    outbox.start()
+    client_callback = outbox.push
+    kis_ws_manager.set_status_hook(client_callback, outbox.push)
 
     try:
-        # 3. KIS 웹소켓에 구독 요청
+        # 2. KIS 웹소켓에 구독 요청 + 콜백 등록
         tr_id = "H0STCNT0" if market == "domestic" else "HDFSCNT0"
         
         # subscribe_items 메서드를 사용하여 구독 추가
         await kis_ws_manager.subscribe_items([
             {"tr_id": tr_id, "tr_key": code}
-        ])
+        ], client_callback)
         
-        # 4. 연결 유지 루프 (클라이언트 연결 끊김 감지용)
+        # 3. 연결 유지 루프 (클라이언트 연결 끊김 감지용)
         while True:
             await websocket.receive_text() # 클라이언트에서 보내는 메시지 대기 (Ping 등)
 
@@ -194,5 +279,6 @@ async def websocket_endpoint(websocket: WebSocket, market: str, code: str):
     except Exception as e:
         logger.error(f"⚠️ WebSocket Error: {e}")
     finally:
-        # 5. 연결 종료 시 Manager에서 콜백 제거
-        kis_ws_manager.remove_client(client_callback)
\ No newline at end of file
+        # 4. 연결 종료 시 Manager에서 콜백 제거
+        kis_ws_manager.remove_client(client_callback)
+        await outbox.close()
\ No newline at end of file
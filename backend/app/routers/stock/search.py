@@ -1,4 +1,3 @@
-import asyncio
 from fastapi import APIRouter, Query
 
 from services.kis.stock_search import stock_search_service
@@ -19,25 +18,14 @@ async def search_stocks_with_price(
     if not candidates:
         return []
 
-    # 2. 현재가 병렬 조회
-    tasks = []
+    # 2. 현재가 일괄 조회
     domestic_markets = ["KOSPI", "KOSDAQ"] # 국내 시장 코드 정의
-
-    for stock in candidates:
-        market = stock['market']
-        code = stock['code']
-        
-        # [수정] 'domestic' 문자열 비교 대신 실제 시장 코드 확인
-        if market in domestic_markets:
-            tasks.append(stock_info_service._get_domestic_stock(code))
-        else:
-            tasks.append(stock_info_service._get_overseas_stock(code, exchange=market))
-
-    prices = await asyncio.gather(*tasks)
+    quotes = await stock_info_service.get_quotes(candidates)
 
     # 3. 결과 포맷팅
     results = []
-    for stock, price_data in zip(candidates, prices):
+    for stock in candidates:
+        price_data = quotes.get(stock['code'])
         market = stock['market']
         # [수정] 표기 라벨 로직 수정
         market_label = "국내" if market in domestic_markets else "해외"
@@ -0,0 +1,36 @@
+from fastapi import APIRouter
+
+from services.kis.client import kis_client
+from services.kis.rate_limit import kis_rate_limiter
+from services.kis.coalesce import kis_coalescer
+from services.kis.quote_cache import quote_cache
+from services.kis.exchange_rate import exchange_rate_service
+from services.kis.ranking.cache import ranking_cache
+from services.kis.ranking.poller import ranking_poller
+from services.kis.websocket import kis_ws_manager
+from services.kis.relay import relay_stats
+from services.kis.tick_store import tick_store
+from services.kis.candle_store import candle_store
+from services.kis.bar_store import bar_store
+
+router = APIRouter(prefix="/stocks/status", tags=["Stocks Status"])
+
+@router.get("/kis")
+async def read_kis_status():
+    """
+    KIS 연동 상태 및 커넥션 풀 사용량 통계를 반환합니다.
+    """
+    return {
+        "http_client": kis_client.get_stats(),
+        "rate_limiter": kis_rate_limiter.get_stats(),
+        "coalescer": kis_coalescer.get_stats(),
+        "quote_cache": quote_cache.get_stats(),
+        "exchange_rate": exchange_rate_service.get_stats(),
+        "ranking_cache": ranking_cache.get_stats(),
+        "ranking_poller": ranking_poller.get_stats(),
+        "websocket": kis_ws_manager.get_stats(),
+        "relay": relay_stats.get_stats(),
+        "tick_store": tick_store.get_stats(),
+        "candle_store": candle_store.get_stats(),
+        "bar_store": bar_store.get_stats(),
+    }
@@ -151,9 +151,14 @@ class VirtualInvestService:
         result = await db.execute(select(VirtualPortfolio).where(VirtualPortfolio.account_id == account.account_id))
         portfolios = result.scalars().all()
 
+        # 보유 종목 현재가 일괄 조회 (체결 내역 없이 시세만)
+        quotes = await stock_info_service.get_quotes(
+            [{"market": p.market_type, "code": p.stock_code} for p in portfolios]
+        )
+
         response_list = []
         for p in portfolios:
-            stock_info = await stock_info_service.get_stock_detail(p.market_type, p.stock_code)
+            stock_info = quotes.get(p.stock_code)
             current_price = float(stock_info['price'].replace(',', '')) if stock_info else p.average_price
             stock_name = stock_search_service.get_stock_name(p.stock_code)
             valuation = current_price * p.quantity
@@ -1,5 +1,6 @@
+import asyncio
 import logging
-import httpx
+from typing import Optional
 from datetime import datetime, timezone, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -7,16 +8,27 @@ from sqlalchemy.future import select
 from core.config import settings
 from core.database import AsyncSessionLocal
 from models.kis_token import KISToken
+from services.kis.client import kis_client
 
 logger = logging.getLogger(__name__)
 
+# 만료 시각보다 이만큼 먼저 토큰을 미리 갱신
+TOKEN_REFRESH_MARGIN = timedelta(minutes=10)
+
 class KISAuth:
     def __init__(self):
         self.access_token = None
+        self.access_token_expires_at = None
         self.approval_key = None # 웹소켓용 키
+        self.approval_key_expires_at = None
         self.ws_aes_key = None # 웹소켓 복호화용 AES 키
+        self.extra_approval_keys = {} # 추가 웹소켓 세션용 {app_key: (approval_key, expires_at)}
         self.base_url = settings.KIS_BASE_URL
 
+        self._access_token_lock = asyncio.Lock()
+        self._approval_key_lock = asyncio.Lock()
+        self._extra_approval_key_lock = asyncio.Lock()
+
     async def _load_token_from_db(self, session: AsyncSession, token_name: str):
         result = await session.execute(select(KISToken).where(KISToken.token_name == token_name))
         token = result.scalars().first()
@@ -50,20 +62,50 @@ class KISAuth:
             await session.rollback()
             raise
 
+    def _is_fresh(self, token_value: Optional[str], expires_at: Optional[datetime]) -> bool:
+        """만료 시각까지 갱신 여유(TOKEN_REFRESH_MARGIN) 이상 남아 있는지 확인"""
+        if not token_value or not expires_at:
+            return False
+        return expires_at - datetime.now(timezone.utc) > TOKEN_REFRESH_MARGIN
+
+    def _is_valid(self, token_value: Optional[str], expires_at: Optional[datetime]) -> bool:
+        """갱신 여유와 무관하게 아직 만료되지 않았는지 확인"""
+        return bool(token_value and expires_at and expires_at > datetime.now(timezone.utc))
+
     async def get_access_token(self):
         """
         REST API용 Access Token
-        DB에서 먼저 확인 후, 없거나 만료되면 새로 발급
+        메모리 캐시를 먼저 확인하고, 만료가 임박한 경우에만 갱신 (DB 조회 없음)
         """
+        if self._is_fresh(self.access_token, self.access_token_expires_at):
+            return self.access_token
+
+        # 동시에 여러 요청이 들어와도 갱신은 한 번만 수행 (single-flight)
+        async with self._access_token_lock:
+            if self._is_fresh(self.access_token, self.access_token_expires_at):
+                return self.access_token
+
+            try:
+                await self._refresh_access_token()
+            except Exception as e:
+                # 갱신에 실패해도 기존 토큰이 아직 유효하면 계속 사용
+                if self._is_valid(self.access_token, self.access_token_expires_at):
+                    logger.warning(f"⚠️ access_token 갱신 실패, 기존 토큰을 계속 사용합니다: {e}")
+                    return self.access_token
+                raise
+
+            return self.access_token
+
+    async def _refresh_access_token(self):
         async with AsyncSessionLocal() as session:
+            # 콜드 스타트 또는 다른 워커가 이미 갱신한 경우 DB에 저장된 토큰 재사용
             token_value, expires_at = await self._load_token_from_db(session, "access_token")
-            now = datetime.now(timezone.utc)
-
-            if token_value and expires_at > now:
+            if self._is_fresh(token_value, expires_at):
                 self.access_token = token_value
-                return self.access_token
-            
-            logger.info("🔑 DB에 access_token이 없거나 만료됨. KIS에서 새로 발급합니다.")
+                self.access_token_expires_at = expires_at
+                return
+
+            logger.info("🔑 access_token이 없거나 만료 임박. KIS에서 새로 발급합니다.")
             url = f"{self.base_url}/oauth2/tokenP"
             data = {
                 "grant_type": "client_credentials",
@@ -71,34 +113,50 @@ class KISAuth:
                 "appsecret": settings.KIS_SECRET_KEY,
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=data)
-                response.raise_for_status()
-                result = response.json()
+            response = await kis_client.post(url, json=data)
+            response.raise_for_status()
+            result = response.json()
 
+            now = datetime.now(timezone.utc)
             self.access_token = result["access_token"]
-            expires_dt = now + timedelta(seconds=int(result["expires_in"]))
+            self.access_token_expires_at = now + timedelta(seconds=int(result["expires_in"]))
+
+            await self._save_token_to_db(session, "access_token", self.access_token, self.access_token_expires_at)
 
-            await self._save_token_to_db(session, "access_token", self.access_token, expires_dt)
-            return self.access_token
-        
     async def get_approval_key(self):
         """
         WEBSOCKET 용 approval key
-        DB에서 먼저 확인 후, 없거나 만료되면 새로 발급
+        메모리 캐시를 먼저 확인하고, 만료가 임박한 경우에만 갱신 (DB 조회 없음)
         """
+        if self._is_fresh(self.approval_key, self.approval_key_expires_at):
+            return self.approval_key
+
+        async with self._approval_key_lock:
+            if self._is_fresh(self.approval_key, self.approval_key_expires_at):
+                return self.approval_key
+
+            try:
+                await self._refresh_approval_key()
+            except Exception as e:
+                if self._is_valid(self.approval_key, self.approval_key_expires_at):
+                    logger.warning(f"⚠️ approval_key 갱신 실패, 기존 키를 계속 사용합니다: {e}")
+                    return self.approval_key
+                raise
+
+            return self.approval_key
+
+    async def _refresh_approval_key(self):
         async with AsyncSessionLocal() as session:
             token_value, expires_at = await self._load_token_from_db(session, "approval_key")
-            now = datetime.now(timezone.utc)
-
-            if token_value and expires_at > now:
+            if self._is_fresh(token_value, expires_at):
                 self.approval_key = token_value
+                self.approval_key_expires_at = expires_at
                 self.ws_aes_key = self.approval_key[:32]
-                return self.approval_key
-            
-            logger.info("🔑 DB에 approval_key가 없거나 만료됨. KIS에서 새로 발급합니다.")
+                return
+
+            logger.info("🔑 approval_key가 없거나 만료 임박. KIS에서 새로 발급합니다.")
             url = f"{self.base_url}/oauth2/Approval"
-            
+
             headers = {"content-type": "application/json; utf-8"}
             data = {
                 "grant_type": "client_credentials",
@@ -106,19 +164,48 @@ class KISAuth:
                 "secretkey": settings.KIS_SECRET_KEY
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, headers=headers, json=data)
-                response.raise_for_status()
-                result = response.json()
+            response = await kis_client.post(url, headers=headers, json=data)
+            response.raise_for_status()
+            result = response.json()
 
+            now = datetime.now(timezone.utc)
             self.approval_key = result["approval_key"]
             self.ws_aes_key = self.approval_key[:32]
-            
+
             expires_in_seconds = 24 * 3600
-            expires_dt = now + timedelta(seconds=expires_in_seconds)
+            self.approval_key_expires_at = now + timedelta(seconds=expires_in_seconds)
 
-            await self._save_token_to_db(session, "approval_key", self.approval_key, expires_dt)
+            await self._save_token_to_db(session, "approval_key", self.approval_key, self.approval_key_expires_at)
+
+    async def get_extra_approval_key(self, app_key: str, secret_key: str):
+        """
+        추가 웹소켓 세션(다른 앱키)용 approval key
+        기본 앱키와 달리 DB에 저장하지 않고 메모리에서만 관리
+        """
+        approval_key, expires_at = self.extra_approval_keys.get(app_key, (None, None))
+        if self._is_fresh(approval_key, expires_at):
+            return approval_key
+
+        async with self._extra_approval_key_lock:
+            approval_key, expires_at = self.extra_approval_keys.get(app_key, (None, None))
+            if self._is_fresh(approval_key, expires_at):
+                return approval_key
+
+            logger.info(f"🔑 추가 세션용 approval_key를 발급합니다. (appkey: {app_key[:6]}...)")
+            url = f"{self.base_url}/oauth2/Approval"
+            headers = {"content-type": "application/json; utf-8"}
+            data = {
+                "grant_type": "client_credentials",
+                "appkey": app_key,
+                "secretkey": secret_key
+            }
+
+            response = await kis_client.post(url, headers=headers, json=data)
+            response.raise_for_status()
+            approval_key = response.json()["approval_key"]
+            expires_at = datetime.now(timezone.utc) + timedelta(hours=24)
+
+            self.extra_approval_keys[app_key] = (approval_key, expires_at)
+            return approval_key
 
-            return self.approval_key
-        
 kis_auth = KISAuth()
\ No newline at end of file
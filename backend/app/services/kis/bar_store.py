@@ -0,0 +1,463 @@
+import os
+import re
+import time
+import asyncio
+import logging
+import datetime
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from core.config import settings
+from services.kis.data import kis_data, to_krw_bar
+from services.kis.exchange_rate import exchange_rate_service
+from services.kis.market_hours import is_market_open, now_kst
+
+logger = logging.getLogger(__name__)
+
+BarKey = Tuple[str, str, str] # (market, code, period)
+
+COLUMNS = ("dates", "open", "high", "low", "close", "volume")
+
+# 일봉으로 만드는 차트 주기: D(일), W(주), M(월), Y(년), ND(N거래일, 예: 5D)
+RESAMPLE_UNITS = ("D", "W", "M", "Y")
+# 시작일 없이 최근 limit개를 요청할 때 필요한 일봉 구간 (1봉당 달력 일수, 여유 포함)
+LOOKBACK_DAYS_PER_BAR = {"D": 1.5, "W": 7.5, "M": 31, "Y": 366}
+
+def parse_period(period: str) -> Optional[Tuple[str, int]]:
+    """차트 period → (단위, 묶음 크기). 일봉으로 만들 수 없는 주기(분봉 등)면 None"""
+    if period in RESAMPLE_UNITS:
+        return period, 1
+    if period.endswith("D") and period[:-1].isdigit() and int(period[:-1]) > 0:
+        return "D", int(period[:-1])
+    return None
+
+def _default_dir() -> str:
+    app_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return os.path.join(os.path.dirname(app_dir), "data", "bars")
+
+class Bars(NamedTuple):
+    """일봉 컬럼 (날짜 오름차순, 가격은 현지 통화)"""
+    dates: np.ndarray # int32 YYYYMMDD
+    open: np.ndarray # float64
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray # int64
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @classmethod
+    def empty(cls) -> "Bars":
+        return cls.from_rows([])
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]]) -> "Bars":
+        return cls(
+            np.array([int(row["time"]) for row in rows], dtype=np.int32),
+            np.array([row["open"] for row in rows], dtype=np.float64),
+            np.array([row["high"] for row in rows], dtype=np.float64),
+            np.array([row["low"] for row in rows], dtype=np.float64),
+            np.array([row["close"] for row in rows], dtype=np.float64),
+            np.array([row["volume"] for row in rows], dtype=np.int64),
+        )
+
+    def merge(self, other: "Bars") -> "Bars":
+        """같은 날짜는 other 값 우선 (장중에 받은 당일 봉을 최신 값으로 교체)"""
+        if not len(other):
+            return self
+        columns = [np.concatenate([a, b]) for a, b in zip(self, other)]
+        # 뒤에서부터 처음 나온 날짜만 남김 → other 우선
+        _, index = np.unique(columns[0][::-1], return_index=True)
+        index = len(columns[0]) - 1 - index
+        return Bars(*(column[index] for column in columns))
+
+    def between(self, start: Optional[int] = None, end: Optional[int] = None) -> "Bars":
+        lo = 0 if start is None else int(np.searchsorted(self.dates, start, side="left"))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, end, side="right"))
+        return Bars(*(column[lo:hi] for column in self))
+
+    def resample(self, unit: str, size: int = 1) -> "Bars":
+        """
+        일봉 → 주/월/년봉, N거래일봉 (벡터 연산)
+        봉 날짜는 구간의 첫 거래일. N거래일봉은 최근 봉이 항상 N일을 채우도록 마지막 날짜 기준으로 묶음
+        """
+        n = len(self.dates)
+        if not n or (unit == "D" and size == 1):
+            return self
+
+        dates = self.dates.astype(np.int64)
+        if unit == "W":
+            # YYYYMMDD → 1970-01-01 기준 일수 → 월요일 시작 주 번호 (1970-01-01은 목요일)
+            days = (
+                (dates // 10000 - 1970).astype("datetime64[Y]")
+                + (dates // 100 % 100 - 1).astype("timedelta64[M]")
+                + (dates % 100 - 1).astype("timedelta64[D]")
+            ).astype(np.int64)
+            group = (days + 3) // 7
+        elif unit == "M":
+            group = dates // 100
+        elif unit == "Y":
+            group = dates // 10000
+        else:
+            # 마지막 봉부터 거꾸로 센 번호로 묶음 → 가장 최근 그룹이 항상 size개, 모자라는 쪽은 가장 오래된 그룹
+            group = (n - 1 - np.arange(n)) // size
+
+        starts = np.flatnonzero(np.concatenate(([True], group[1:] != group[:-1])))
+        ends = np.concatenate((starts[1:], [n])) - 1
+        return Bars(
+            self.dates[starts],
+            self.open[starts],
+            np.maximum.reduceat(self.high, starts),
+            np.minimum.reduceat(self.low, starts),
+            self.close[ends],
+            np.add.reduceat(self.volume, starts),
+        )
+
+    def to_rows(self, rate: float = 1.0) -> List[Dict[str, Any]]:
+        """차트 응답 형식 ({time, open, high, low, close, volume}, 원화 정수)"""
+        return [
+            to_krw_bar({"time": str(d), "open": o, "high": h, "low": l, "close": c, "volume": v}, rate)
+            for d, o, h, l, c, v in zip(*(column.tolist() for column in self))
+        ]
+
+class BarEntry:
+    def __init__(self, bars: Bars, covered_from: int = 0, synced_at: float = 0.0, complete: bool = False):
+        self.bars = bars
+        self.covered_from = covered_from # 이 날짜 이후 구간은 빠짐없이 받아 둔 상태 (0: 없음)
+        self.synced_at = synced_at # 마지막 최신 구간 동기화 시각 (wall clock)
+        self.complete = complete # 상장일까지 받아 더 과거 데이터가 없음
+
+class BarStore:
+    """
+    일봉 로컬 저장소 (종목별 NPZ 파일: {dir}/{market}/{code}_{period}.npz)
+    - 가격은 현지 통화로 저장하고 조회 시 원화로 환산 (환율이 바뀌어도 다시 받지 않음)
+    - 동기화는 마지막 저장일 이후만 KIS에서 받아 추가 (장중에는 당일 봉 갱신을 위해 주기적으로)
+    - 요청 구간이 저장된 구간보다 과거면 부족한 구간만 추가로 받음
+    차트 API와 AI 학습/예측이 같은 저장소를 사용
+    """
+    def __init__(self, directory: str, max_memory: int, max_pages: int, window_days: int, concurrency: int, listing_empty_windows: int, chart_max_years: int, chart_sync_days: int):
+        self.directory = directory
+        self.max_memory = max_memory
+        self.max_pages = max_pages
+        self.window_days = window_days
+        self.concurrency = concurrency
+        self.listing_empty_windows = listing_empty_windows
+        self.chart_max_years = chart_max_years
+        self.chart_sync_days = chart_sync_days
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.entries: "OrderedDict[BarKey, BarEntry]" = OrderedDict()
+        self.locks: Dict[BarKey, asyncio.Lock] = {}
+        self.backfills: Dict[BarKey, asyncio.Task] = {} # 차트 요청 후 백그라운드로 받는 과거 구간
+
+        self.hits = 0
+        self.syncs = 0
+        self.pages = 0
+
+    # --- 파일 ---
+    def _key(self, market: str, code: str, period: str = "D") -> BarKey:
+        return market.upper(), code.upper(), period
+
+    def _path(self, key: BarKey) -> str:
+        market, code, period = key
+        safe = re.sub(r"[^0-9A-Z._-]", "_", code)
+        return os.path.join(self.directory, market, f"{safe}_{period}.npz")
+
+    def _read(self, key: BarKey) -> BarEntry:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return BarEntry(Bars.empty())
+        try:
+            with np.load(path) as data:
+                bars = Bars(*(data[column] for column in COLUMNS))
+                complete = bool(data["complete"]) if "complete" in data.files else False
+                return BarEntry(bars, int(data["covered_from"]), float(data["synced_at"]), complete)
+        except Exception as e:
+            logger.warning(f"⚠️ 일봉 파일을 읽지 못해 새로 받습니다. ({path}): {e}")
+            return BarEntry(Bars.empty())
+
+    def _write(self, key: BarKey, entry: BarEntry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f, **dict(zip(COLUMNS, entry.bars)),
+                    covered_from=np.int64(entry.covered_from), synced_at=np.float64(entry.synced_at),
+                    complete=np.bool_(entry.complete),
+                )
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.error(f"⛔ 일봉 파일 저장 실패 ({path}): {e}")
+
+    def _entry(self, key: BarKey) -> BarEntry:
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = self._read(key)
+            while len(self.entries) > self.max_memory:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return entry
+
+    # --- KIS 동기화 ---
+    async def _fetch_page(self, key: BarKey, start: str, end: str) -> Optional[List[Dict[str, Any]]]:
+        """1페이지 조회. 실패면 None, 데이터가 없는 구간이면 []"""
+        market, code, period = key
+        async with self.semaphore:
+            self.pages += 1
+            try:
+                return await kis_data.fetch_daily_bars(market, code, period, start, end)
+            except Exception as e:
+                logger.error(f"⛔ 일봉 조회 실패 ({code} {start}~{end}): {e}")
+                return None
+
+    async def _fetch_range(self, key: BarKey, start: str, end: str) -> Tuple[Bars, Optional[int], bool]:
+        """
+        start ~ end 구간 일봉, 빠짐없이 받은 구간의 시작일 (covered ~ end, 하나도 못 받았으면 None), 상장일 도달 여부
+        start가 빈 문자열이면 최근 1페이지만 (covered = 받은 가장 오래된 날짜)
+        구간을 1페이지(100건) 이내 크기의 창으로 나누어 동시에 요청 (국내: 시작/종료일, 해외: 기준일 이전 100건)
+        최근 창부터 동시 요청 수만큼씩 받고, 빈 창이 연속으로 listing_empty_windows개 나오면 상장 전으로 보고 중단
+        (그보다 짧은 빈 구간은 거래정지로 보고 계속 받음)
+        실패한 창이 있으면 그 창보다 과거에 받은 봉은 버림 (중간에 빈 구간이 생기지 않도록)
+        """
+        if not start:
+            chunk = await self._fetch_page(key, "", end)
+            if not chunk:
+                return Bars.empty(), None, False
+            bars = Bars.from_rows(chunk)
+            return bars, int(bars.dates.min()), False
+
+        windows = []
+        window_end = datetime.datetime.strptime(end, "%Y%m%d")
+        first = datetime.datetime.strptime(start, "%Y%m%d")
+        while window_end >= first and len(windows) < self.max_pages:
+            window_start = max(first, window_end - datetime.timedelta(days=self.window_days - 1))
+            windows.append((window_start.strftime("%Y%m%d"), window_end.strftime("%Y%m%d")))
+            window_end = window_start - datetime.timedelta(days=1)
+
+        rows = []
+        covered = None
+        listed = False
+        empty_run = 0
+        done = False
+        for i in range(0, len(windows), self.concurrency):
+            batch = windows[i:i + self.concurrency]
+            chunks = await asyncio.gather(*[self._fetch_page(key, s, e) for s, e in batch])
+            for (window_start, _), chunk in zip(batch, chunks):
+                if chunk is None:
+                    done = True
+                    break
+                covered = int(window_start)
+                empty_run = 0 if chunk else empty_run + 1
+                rows.extend(chunk)
+                if empty_run >= self.listing_empty_windows:
+                    # 상장 전 구간: start까지 더 받을 데이터가 없음
+                    covered = int(start)
+                    listed = True
+                    done = True
+                    break
+            if done:
+                break
+
+        # 창 경계의 중복 날짜 제거 + 정렬
+        bars = Bars.empty().merge(Bars.from_rows(rows))
+        return bars, covered, listed
+
+    def _is_stale(self, key: BarKey, entry: BarEntry) -> bool:
+        if not len(entry.bars):
+            return True
+        market_type = "domestic" if key[0] == "KR" else "overseas"
+        interval = settings.BAR_STORE_REFRESH_OPEN if is_market_open(market_type) else settings.BAR_STORE_REFRESH_CLOSED
+        return time.time() - entry.synced_at > interval
+
+    @staticmethod
+    def _rebased(bars: Bars, fetched: Bars) -> bool:
+        """저장된 마감 봉(마지막에서 두 번째)과 새로 받은 같은 날짜 봉의 가격이 다르면 True"""
+        if len(bars) < 2:
+            return False
+        day = bars.dates[-2]
+        i = int(np.searchsorted(fetched.dates, day))
+        if i >= len(fetched.dates) or fetched.dates[i] != day:
+            return False
+        stored = [column[-2] for column in bars[1:5]]
+        latest = [column[i] for column in fetched[1:5]]
+        return not np.allclose(stored, latest, rtol=1e-6)
+
+    def _before_listing(self, entry: BarEntry) -> bool:
+        """
+        가장 오래된 봉 이전으로 빈 구간을 listing_empty_windows개 창 이상 받아 두었으면 상장 전으로 판단
+        (과거 구간을 페이지 단위로 나누어 받는 경우에도 빈 구간 길이를 누적해서 봄)
+        """
+        first = datetime.datetime.strptime(str(entry.bars.dates[0]), "%Y%m%d")
+        covered = datetime.datetime.strptime(str(entry.covered_from), "%Y%m%d")
+        return (first - covered).days >= self.listing_empty_windows * self.window_days
+
+    async def sync(self, market: str, code: str, start: Optional[str] = None, period: str = "D") -> BarEntry:
+        """
+        저장된 일봉을 최신으로 맞추고, start(YYYYMMDD)가 저장 구간보다 과거면 부족한 구간을 추가로 받음
+        조회에 실패한 구간은 저장(covered_from 갱신)하지 않고 다음 호출에서 다시 받음
+        """
+        key = self._key(market, code, period)
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entry(key)
+            changed = False
+            fetched_any = False
+            today = now_kst().strftime("%Y%m%d")
+
+            # 1. 최신 구간: 마감된 마지막 봉(기준 비교용)부터 오늘까지. 마지막 봉은 장중 봉일 수 있어 다시 받음
+            if self._is_stale(key, entry):
+                bars = entry.bars
+                since = str(bars.dates[max(len(bars) - 2, 0)]) if len(bars) else (start or "")
+                fetched, covered, listed = await self._fetch_range(key, since, today)
+                if covered is not None and self._rebased(bars, fetched):
+                    # 액면분할/배당 등으로 수정주가 기준이 바뀜 (해외는 수정주가로 받음) → 저장 구간을 처음부터 다시 받음
+                    logger.info(f"💡 {key[0]} {key[1]} 수정주가 기준 변경, 일봉을 다시 받습니다.")
+                    since = str(entry.covered_from)
+                    bars = entry.bars = Bars.empty()
+                    entry.covered_from, entry.complete = 0, False
+                    fetched, covered, listed = await self._fetch_range(key, since, today)
+                if covered is not None and (not len(bars) or covered <= int(since)):
+                    # 처음 받는 종목은 받은 구간까지만, 이미 있는 종목은 마지막 저장일까지 이어진 경우만 반영
+                    entry.bars = bars.merge(fetched.between(covered))
+                    if not len(bars):
+                        entry.covered_from = covered
+                        entry.complete = listed
+                    entry.synced_at = time.time()
+                    changed = True
+                fetched_any = True
+                self.syncs += 1
+
+            # 2. 과거 구간: 요청 시작일이 받아 둔 구간보다 과거면 그 사이만 (상장일까지 받았으면 생략)
+            if start and len(entry.bars) and int(start) < entry.covered_from and not entry.complete:
+                before = (datetime.datetime.strptime(str(entry.covered_from), "%Y%m%d") - datetime.timedelta(days=1)).strftime("%Y%m%d")
+                fetched, covered, listed = await self._fetch_range(key, start, before)
+                if covered is not None:
+                    entry.bars = entry.bars.merge(fetched.between(covered))
+                    entry.covered_from = covered
+                    entry.complete = listed or self._before_listing(entry)
+                    changed = True
+                fetched_any = True
+                self.syncs += 1
+
+            if changed:
+                self._write(key, entry)
+            if not fetched_any:
+                self.hits += 1
+            return entry
+
+    # --- 조회 ---
+    async def get_bars(self, market: str, code: str, start: Optional[str] = None, end: Optional[str] = None) -> Bars:
+        """현지 통화 일봉 (start ~ end, YYYYMMDD)"""
+        entry = await self.sync(market, code, start)
+        return entry.bars.between(int(start) if start else None, int(end) if end else None)
+
+    def _chart_floor(self) -> str:
+        """차트로 조회하는 가장 과거 날짜 (오늘 - chart_max_years)"""
+        return (now_kst() - datetime.timedelta(days=int(365.25 * self.chart_max_years))).strftime("%Y%m%d")
+
+    async def _sync_chart(self, market: str, code: str, first: str, anchor: datetime.datetime) -> BarEntry:
+        """
+        차트 요청 경로의 동기화: anchor 기준 chart_sync_days 구간까지만 응답 전에 받고,
+        first까지 더 과거 구간은 백그라운드로 받음 (년/월봉 첫 요청이 수십 페이지를 기다리지 않도록)
+        """
+        sync_from = (anchor - datetime.timedelta(days=self.chart_sync_days)).strftime("%Y%m%d")
+        if first >= sync_from:
+            return await self.sync(market, code, first)
+
+        entry = await self.sync(market, code, sync_from)
+        if int(first) < entry.covered_from and not entry.complete:
+            self._backfill_later(market, code, first)
+        return entry
+
+    def _backfill_later(self, market: str, code: str, start: str):
+        key = self._key(market, code)
+        if key in self.backfills:
+            return
+        task = asyncio.create_task(self.sync(market, code, start))
+        self.backfills[key] = task
+        task.add_done_callback(lambda _: self.backfills.pop(key, None))
+
+    async def get_chart(self, market: str, code: str, start: Optional[str] = None, end: Optional[str] = None, limit: Optional[int] = None, period: str = "D") -> List[Dict[str, Any]]:
+        """
+        차트 응답 형식 봉 (원화 환산, 날짜 오름차순). limit이면 최근 limit건
+        period: D / W / M / Y / ND. 일봉 외 주기는 저장된 일봉을 묶어서 만듦 (KIS 호출 없음)
+        """
+        unit, size = parse_period(period) or ("D", 1)
+        if limit and not start and (unit != "D" or size > 1):
+            days = int(limit * size * LOOKBACK_DAYS_PER_BAR[unit])
+            start = max((now_kst() - datetime.timedelta(days=days)).strftime("%Y%m%d"), self._chart_floor())
+
+        if start:
+            entry = await self._sync_chart(market, code, start, now_kst())
+            bars = entry.bars.between(int(start), int(end) if end else None)
+        else:
+            bars = await self.get_bars(market, code, start, end)
+        bars = bars.resample(unit, size)
+        if limit:
+            bars = bars.between(int(bars.dates[-limit]) if len(bars) > limit else None)
+        rate = 1.0 if market == "KR" else exchange_rate_service.get_rate()
+        return bars.to_rows(rate)
+
+    async def get_chart_page(self, market: str, code: str, period: str = "D", start: Optional[str] = None, end: Optional[str] = None, cursor: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+        """
+        구간/커서 기반 차트 조회 → {"output": 봉 목록(오래된 순), "next_cursor": 더 과거 페이지 커서 또는 None}
+        cursor: 이전 응답의 next_cursor (그 날짜 이전 봉부터 limit개). 스크롤할 때마다 과거 구간을 이어서 요청
+        start가 없으면 end(또는 오늘) 기준 limit개에 필요한 구간만 저장소에서 꺼냄 (부족하면 그 구간만 KIS에서 받음)
+        """
+        if cursor:
+            before = (datetime.datetime.strptime(cursor, "%Y%m%d") - datetime.timedelta(days=1)).strftime("%Y%m%d")
+            end = min(end, before) if end else before
+
+        unit, size = parse_period(period) or ("D", 1)
+        floor = self._chart_floor()
+        anchor = datetime.datetime.strptime(end, "%Y%m%d") if end else now_kst()
+        if start:
+            first = max(start, floor)
+        else:
+            days = int((limit + 1) * size * LOOKBACK_DAYS_PER_BAR[unit])
+            first = max((anchor - datetime.timedelta(days=days)).strftime("%Y%m%d"), floor)
+
+        entry = await self._sync_chart(market, code, first, anchor)
+        bars = entry.bars.between(int(first), int(end) if end else None).resample(unit, size)
+        if len(bars) > limit:
+            bars = bars.between(int(bars.dates[-limit]))
+            has_more = True
+        elif start and (entry.complete or entry.covered_from <= int(first)):
+            # 요청한 구간을 모두 반환
+            has_more = False
+        else:
+            # 이 페이지보다 과거 봉이 저장되어 있거나, 아직 상장일까지 받지 않았으면 더 있음 (조회 가능 구간 이내)
+            # (거래정지 등으로 조회 구간에 봉이 적거나 없어도 커서를 이어감)
+            oldest = int(bars.dates[0]) if len(bars) else int(first)
+            has_more = oldest > int(floor) and (bool(len(entry.bars) and entry.bars.dates[0] < oldest) or not entry.complete)
+
+        oldest = str(bars.dates[0]) if len(bars) else first
+        rate = 1.0 if market == "KR" else exchange_rate_service.get_rate()
+        return {
+            "output": bars.to_rows(rate),
+            "next_cursor": oldest if has_more else None,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "in_memory": len(self.entries),
+            "hits": self.hits,
+            "syncs": self.syncs,
+            "pages": self.pages,
+        }
+
+bar_store = BarStore(
+    directory=settings.BAR_STORE_DIR or _default_dir(),
+    max_memory=settings.BAR_STORE_MAX_MEMORY,
+    max_pages=settings.BAR_STORE_MAX_PAGES,
+    window_days=settings.BAR_STORE_WINDOW_DAYS,
+    concurrency=settings.BAR_STORE_FETCH_CONCURRENCY,
+    listing_empty_windows=settings.BAR_STORE_LISTING_EMPTY_WINDOWS,
+    chart_max_years=settings.BAR_STORE_CHART_MAX_YEARS,
+    chart_sync_days=settings.BAR_STORE_CHART_SYNC_DAYS,
+)
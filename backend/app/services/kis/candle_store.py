@@ -0,0 +1,246 @@
+import datetime
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from core.config import settings
+from services.kis.ws_parser import Tick
+
+logger = logging.getLogger(__name__)
+
+KST = ZoneInfo("Asia/Seoul")
+
+CANDLE_INTERVALS = (1, 3, 5, 15, 60) # 실시간으로 유지하는 분봉 (분)
+
+CandleKey = Tuple[str, str, int] # (market, code, interval)
+
+def parse_interval(period: str) -> Optional[int]:
+    """차트 period ('1m', '5m', ...) → 분 단위 간격. 메모리에서 유지하지 않는 주기면 None"""
+    if not period.endswith("m"):
+        return None
+    try:
+        interval = int(period[:-1])
+    except ValueError:
+        return None
+    return interval if interval in CANDLE_INTERVALS else None
+
+def resample_bars(bars: List[Dict[str, Any]], interval: int) -> List[Dict[str, Any]]:
+    """분봉 목록(시간 오름차순)을 interval분 봉으로 합침. 이미 interval분 봉이면 그대로"""
+    step = interval * 60
+    result = []
+    for bar in bars:
+        start = bar["time"] - bar["time"] % step
+        if result and result[-1]["time"] == start:
+            last = result[-1]
+            last["high"] = max(last["high"], bar["high"])
+            last["low"] = min(last["low"], bar["low"])
+            last["close"] = bar["close"]
+            last["volume"] += bar["volume"]
+        else:
+            result.append({**bar, "time": start})
+    return result
+
+def _bar_dict(bar: list) -> Dict[str, Any]:
+    return {"time": bar[0], "open": bar[1], "high": bar[2], "low": bar[3], "close": bar[4], "volume": bar[5]}
+
+class CandleSeries:
+    """종목 1개, 주기 1개의 분봉 (오래된 순, [time, open, high, low, close, volume])"""
+    def __init__(self, interval: int, max_bars: int):
+        self.step = interval * 60
+        self.bars: deque = deque(maxlen=max_bars)
+        self.seeded = False # REST 분봉으로 과거 구간을 채웠는지 여부
+
+    def update(self, ts: int, price: int, volume: int) -> Optional[list]:
+        """체결 1건 반영 후 갱신된 봉 반환 (이전 봉보다 과거 시각의 체결이면 None)"""
+        start = ts - ts % self.step
+        bars = self.bars
+        if bars and bars[-1][0] == start:
+            bar = bars[-1]
+            if price > bar[2]: bar[2] = price
+            if price < bar[3]: bar[3] = price
+            bar[4] = price
+            bar[5] += volume
+            return bar
+        if bars and bars[-1][0] > start:
+            return None
+        bar = [start, price, price, price, price, volume]
+        bars.append(bar)
+        return bar
+
+    def seed(self, history: List[Dict[str, Any]]):
+        """
+        REST 분봉(오래된 순, 같은 주기로 합친 값)으로 과거 구간 채우기
+        실시간 첫 봉과 같은 시각의 봉은 시가/고가/저가를 REST 값과 합침 (실시간 봉은 구독 이후 체결만 반영되어 있음)
+        """
+        live = list(self.bars)
+        first_live = live[0][0] if live else None
+        rows = []
+        for bar in history:
+            row = [bar["time"], bar["open"], bar["high"], bar["low"], bar["close"], bar["volume"]]
+            if first_live is None or row[0] < first_live:
+                rows.append(row)
+            elif row[0] == first_live:
+                first = live[0]
+                first[1] = row[1]
+                first[2] = max(first[2], row[2])
+                first[3] = min(first[3], row[3])
+                first[5] = max(first[5], row[5])
+
+        self.bars.clear()
+        self.bars.extend(rows + live)
+        self.seeded = True
+
+    def last(self, n: Optional[int] = None) -> List[Dict[str, Any]]:
+        bars = list(self.bars)
+        if n is not None:
+            bars = bars[-n:]
+        return [_bar_dict(bar) for bar in bars]
+
+class CandleStore:
+    """
+    실시간 체결(웹소켓)로 만드는 종목별 1/3/5/15/60분봉
+    - 업스트림에 체결을 구독 중인 종목만 유지 (구독 해제 시 제거)
+    - 주기별로 처음 차트를 요청할 때 REST 분봉으로 한 번 채우고, 이후 /stocks/chart?period=Nm 은 메모리에서 제공
+    - 봉 변경분은 구독한 클라이언트에 {"type": "candle", ...} 로 전송
+    """
+    def __init__(self, max_bars: int, max_symbols: int):
+        self.max_bars = max_bars
+        self.max_symbols = max_symbols
+        self.series: "OrderedDict[Tuple[str, str], Dict[int, CandleSeries]]" = OrderedDict()
+        self.listeners: Dict[CandleKey, Set[Callable]] = {}
+        self._day_starts: Dict[str, int] = {} # 날짜(YYYYMMDD) → 자정 timestamp (KST)
+
+        self.ticks = 0
+        self.hits = 0
+        self.misses = 0
+        self.pushes = 0
+
+    def _key(self, market: str, code: str) -> Tuple[str, str]:
+        return market, code.upper()
+
+    def _timestamp(self, date: str, time: str) -> Optional[int]:
+        """체결 일자(YYYYMMDD) + 시간(HHMMSS, KST) → timestamp (REST 분봉과 같은 기준)"""
+        day_start = self._day_starts.get(date)
+        if day_start is None:
+            try:
+                day_start = int(datetime.datetime.strptime(date, "%Y%m%d").replace(tzinfo=KST).timestamp())
+            except (TypeError, ValueError):
+                return None
+            if len(self._day_starts) > 8:
+                self._day_starts.clear()
+            self._day_starts[date] = day_start
+        try:
+            hhmmss = int(time)
+        except (TypeError, ValueError):
+            return None
+        return day_start + hhmmss // 10000 * 3600 + hhmmss // 100 % 100 * 60 + hhmmss % 100
+
+    def append_tick(self, market: str, tick: Tick):
+        """웹소켓 체결 1건 반영 (market: 'domestic' / 'overseas', 가격은 원화 환산 값)"""
+        ts = self._timestamp(tick.date, tick.time)
+        if ts is None:
+            return
+        try:
+            price = int(float(tick.price))
+            volume = int(float(tick.vol or 0))
+        except (TypeError, ValueError):
+            return
+
+        key = self._key(market, tick.code)
+        series = self._series(key)
+        self.ticks += 1
+        for interval, candles in series.items():
+            bar = candles.update(ts, price, volume)
+            if bar is None:
+                continue
+            listeners = self.listeners.get((key[0], key[1], interval))
+            if listeners:
+                self._push(listeners, {
+                    "type": "candle",
+                    "market": key[0],
+                    "code": key[1],
+                    "period": f"{interval}m",
+                    "full": False,
+                    "bar": _bar_dict(bar),
+                })
+
+    def _series(self, key: Tuple[str, str]) -> Dict[int, CandleSeries]:
+        """종목의 주기별 분봉 (없으면 생성, 최근 사용 순으로 max_symbols개까지 유지)"""
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = {interval: CandleSeries(interval, self.max_bars) for interval in CANDLE_INTERVALS}
+            while len(self.series) > self.max_symbols:
+                self.series.popitem(last=False)
+        else:
+            self.series.move_to_end(key)
+        return series
+
+    def _push(self, listeners: Set[Callable], message: Dict[str, Any]):
+        for callback in list(listeners):
+            try:
+                callback(message)
+                self.pushes += 1
+            except Exception:
+                pass
+
+    def remove(self, market: str, code: str):
+        self.series.pop(self._key(market, code), None)
+
+    def get_bars(self, market: str, code: str, interval: int) -> Optional[List[Dict[str, Any]]]:
+        """실시간으로 갱신 중이고 과거 구간이 채워진 종목/주기면 분봉 목록(오래된 순) 반환, 아니면 None"""
+        series = self.series.get(self._key(market, code))
+        candles = series.get(interval) if series else None
+        if candles is None or not candles.seeded:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return candles.last()
+
+    def seed(self, market: str, code: str, interval: int, history: List[Dict[str, Any]], create: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """
+        REST 분봉(오래된 순, {time, open, high, low, close, volume})으로 과거 구간 채우기
+        실시간 체결이 들어오고 있는 종목만 대상 (create면 아직 체결이 없어도 분봉을 만들어 채움 - 분봉 구독 시작 시)
+        채운 경우 실시간 봉과 합친 분봉 목록 반환
+        """
+        key = self._key(market, code)
+        series = self._series(key) if create else self.series.get(key)
+        candles = series.get(interval) if series else None
+        if candles is None or candles.seeded:
+            return None
+        candles.seed(resample_bars(history, interval))
+        return candles.last()
+
+    def subscribe(self, market: str, code: str, interval: int, callback: Callable):
+        key = self._key(market, code)
+        self.listeners.setdefault((key[0], key[1], interval), set()).add(callback)
+
+    def unsubscribe(self, market: str, code: str, interval: int, callback: Callable):
+        key = self._key(market, code)
+        listeners = self.listeners.get((key[0], key[1], interval))
+        if listeners is None:
+            return
+        listeners.discard(callback)
+        if not listeners:
+            del self.listeners[(key[0], key[1], interval)]
+
+    def remove_listener(self, callback: Callable):
+        for market, code, interval in list(self.listeners):
+            self.unsubscribe(market, code, interval, callback)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "symbols": len(self.series),
+            "seeded": sum(1 for series in self.series.values() for candles in series.values() if candles.seeded),
+            "max_bars": self.max_bars,
+            "listeners": sum(len(listeners) for listeners in self.listeners.values()),
+            "ticks": self.ticks,
+            "hits": self.hits,
+            "misses": self.misses,
+            "pushes": self.pushes,
+        }
+
+candle_store = CandleStore(
+    max_bars=settings.CANDLE_MAX_BARS,
+    max_symbols=settings.CANDLE_STORE_MAX_SYMBOLS,
+)
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+import importlib.util
+import httpx
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Hashable
+
+from core.config import settings
+from services.kis.rate_limit import kis_rate_limiter
+from services.kis.coalesce import kis_coalescer
+from services.kis.resilience import (
+    CircuitBreaker, KisCircuitOpenError, endpoint_of, timeout_for, backoff_delay,
+    is_retryable_exception, is_retryable_response, is_success_response,
+)
+
+logger = logging.getLogger(__name__)
+
+class KisHttpClient:
+    """
+    KIS REST 호출에 공통으로 사용하는 장수명(long-lived) httpx 클라이언트
+    요청마다 AsyncClient를 새로 만들지 않고 커넥션 풀(keep-alive, 가능하면 HTTP/2)을 재사용
+    """
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+        # h2 패키지가 설치된 경우에만 HTTP/2 사용
+        self.http2 = settings.KIS_HTTP2 and importlib.util.find_spec("h2") is not None
+
+        # 풀 사용량 통계
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_requests = 0
+        self.total_errors = 0
+        self.total_elapsed = 0.0
+
+        # 재시도 / 서킷 브레이커
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.stale_responses: "OrderedDict[Hashable, httpx.Response]" = OrderedDict()
+        self.retries = 0
+        self.fast_failures = 0
+        self.stale_served = 0
+
+    def _create_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.KIS_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.KIS_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.KIS_HTTP_KEEPALIVE_EXPIRY,
+        )
+        return httpx.AsyncClient(
+            http2=self.http2,
+            limits=limits,
+            timeout=httpx.Timeout(settings.KIS_HTTP_TIMEOUT),
+        )
+
+    async def start(self):
+        if self.client is None or self.client.is_closed:
+            self.client = self._create_client()
+            logger.info(f"✅ KIS HTTP 클라이언트 시작 (HTTP/2: {self.http2}, max_connections: {settings.KIS_HTTP_MAX_CONNECTIONS})")
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+            logger.info("✅ KIS HTTP 클라이언트가 종료되었습니다.")
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # lifespan 밖(학습 스크립트 등)에서 호출되는 경우를 위해 지연 생성
+        if self.client is None or self.client.is_closed:
+            self.client = self._create_client()
+        return self.client
+
+    async def _send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        client = self._get_client()
+
+        self.in_flight += 1
+        self.total_requests += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            return await client.request(method, url, **kwargs)
+        except Exception:
+            self.total_errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.total_elapsed += time.perf_counter() - started
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        headers = kwargs.get("headers") or {}
+        if "tr_id" not in headers:
+            return await self._send(method, url, **kwargs)
+        return await self._request_kis(method, url, **kwargs)
+
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            breaker = self.breakers[endpoint] = CircuitBreaker(
+                endpoint,
+                failure_threshold=settings.KIS_CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=settings.KIS_CIRCUIT_RESET_TIMEOUT,
+            )
+        return breaker
+
+    def _request_key(self, url: str, headers: Dict[str, str], params: Optional[Dict[str, Any]]) -> Hashable:
+        return url, headers["tr_id"], tuple(sorted((params or {}).items()))
+
+    def _store_stale(self, key: Hashable, response: httpx.Response):
+        self.stale_responses[key] = response
+        self.stale_responses.move_to_end(key)
+        while len(self.stale_responses) > settings.KIS_STALE_CACHE_SIZE:
+            self.stale_responses.popitem(last=False)
+
+    def _serve_stale(self, key: Optional[Hashable], error: Exception) -> httpx.Response:
+        stale = self.stale_responses.get(key) if key is not None else None
+        if stale is None:
+            raise error
+        self.stale_served += 1
+        return stale
+
+    async def _request_kis(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        KIS API 호출 정책
+        엔드포인트별 타임아웃 → 속도 제한 → 재시도(지수 백오프 + jitter) → 서킷 브레이커
+        서킷이 열려 있거나 재시도가 모두 실패하면 마지막 정상 응답(stale)을 대신 반환
+        """
+        headers = kwargs["headers"]
+        endpoint = endpoint_of(url)
+        breaker = self._breaker(endpoint)
+        stale_key = self._request_key(url, headers, kwargs.get("params")) if method == "GET" else None
+
+        if not breaker.allow():
+            self.fast_failures += 1
+            return self._serve_stale(stale_key, KisCircuitOpenError(f"KIS circuit open: {endpoint}"))
+
+        kwargs.setdefault("timeout", timeout_for(url))
+        response: Optional[httpx.Response] = None
+        error: Optional[Exception] = None
+
+        for attempt in range(settings.KIS_RETRY_MAX + 1):
+            if attempt > 0:
+                self.retries += 1
+                await asyncio.sleep(backoff_delay(attempt - 1))
+
+            # TR ID가 있는 KIS API 호출은 전역 속도 제한기를 통과
+            await kis_rate_limiter.acquire(headers["tr_id"], headers.get("appkey"))
+            try:
+                response, error = await self._send(method, url, **kwargs), None
+            except Exception as e:
+                if not is_retryable_exception(e):
+                    breaker.record_failure()
+                    raise
+                response, error = None, e
+                continue
+
+            if not is_retryable_response(response):
+                break
+
+        if response is not None and not is_retryable_response(response):
+            # 4xx 등 재시도 대상이 아닌 응답은 KIS가 살아있다는 의미이므로 서킷에는 성공으로 기록
+            breaker.record_success()
+            if stale_key is not None and is_success_response(response):
+                self._store_stale(stale_key, response)
+            return response
+
+        breaker.record_failure()
+        logger.warning(f"⚠️ KIS 호출 재시도 실패 ({endpoint}): {error or response.status_code}")
+        if stale_key in self.stale_responses:
+            return self._serve_stale(stale_key, error)
+        if response is not None:
+            return response
+        raise error
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        headers = kwargs.get("headers") or {}
+        if "tr_id" not in headers:
+            return await self.request("GET", url, **kwargs)
+
+        # 동일한 TR ID + 파라미터의 시세 조회가 동시에 들어오면 한 번만 호출하고 결과를 공유
+        key = self._request_key(url, headers, kwargs.get("params"))
+        return await kis_coalescer.run(key, lambda: self.request("GET", url, **kwargs))
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def _pool_connections(self):
+        # httpx 내부 transport의 커넥션 풀 (httpcore) 상태를 조회
+        try:
+            return list(self.client._transport._pool.connections)
+        except Exception:
+            return []
+
+    def get_stats(self) -> Dict[str, Any]:
+        connections = self._pool_connections() if self.client else []
+        idle = sum(1 for conn in connections if conn.is_idle())
+
+        return {
+            "http2": self.http2,
+            "max_connections": settings.KIS_HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.KIS_HTTP_MAX_KEEPALIVE,
+            "open_connections": len(connections),
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "total_requests": self.total_requests,
+            "total_errors": self.total_errors,
+            "avg_latency_ms": round(self.total_elapsed / self.total_requests * 1000, 2) if self.total_requests else 0.0,
+            "retries": self.retries,
+            "fast_failures": self.fast_failures,
+            "stale_served": self.stale_served,
+            "circuits": {endpoint: breaker.get_stats() for endpoint, breaker in self.breakers.items()},
+        }
+
+kis_client = KisHttpClient()
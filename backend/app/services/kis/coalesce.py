@@ -0,0 +1,47 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+class RequestCoalescer:
+    """
+    동일한 요청(single-flight) 병합기
+    같은 키의 요청이 이미 진행 중이면 새로 호출하지 않고 진행 중인 결과를 함께 기다림
+    """
+    def __init__(self):
+        self.in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.upstream_calls = 0 # 실제로 실행된 호출 수
+        self.coalesced_hits = 0 # 진행 중인 호출에 합류한 요청 수
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.coalesced_hits += 1
+        else:
+            self.upstream_calls += 1
+            task = asyncio.ensure_future(factory())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+
+        # 한 요청자가 취소되어도 공유 중인 호출은 취소되지 않도록 shield
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: Hashable, task: asyncio.Task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        # 모든 요청자가 취소된 경우에도 예외가 '회수되지 않음' 경고로 남지 않도록 조회
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.upstream_calls + self.coalesced_hits
+        return {
+            "requests": total,
+            "upstream_calls": self.upstream_calls,
+            "coalesced_hits": self.coalesced_hits,
+            "in_flight": len(self.in_flight),
+            "saved_ratio": round(self.coalesced_hits / total, 4) if total else 0.0,
+        }
+
+kis_coalescer = RequestCoalescer()
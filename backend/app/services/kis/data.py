@@ -1,12 +1,25 @@
-import httpx
 import logging
 import datetime
 from zoneinfo import ZoneInfo
 from core.config import settings
 from services.kis.auth import kis_auth
+from services.kis.client import kis_client
+from services.kis.exchange_rate import exchange_rate_service
+from services.kis.candle_store import candle_store, parse_interval, resample_bars
 
 logger = logging.getLogger(__name__)
 
+def to_krw_bar(bar, rate: float = 1.0):
+    """현지 통화 봉 → 원화 정수 봉 (차트 응답 형식)"""
+    return {
+        "time": bar["time"],
+        "open": int(bar["open"] * rate),
+        "high": int(bar["high"] * rate),
+        "low": int(bar["low"] * rate),
+        "close": int(bar["close"] * rate),
+        "volume": int(bar["volume"])
+    }
+
 class KisDataService:
     def __init__(self):
         self.base_url = settings.KIS_BASE_URL
@@ -23,24 +36,25 @@ class KisDataService:
             "custtype": "P"
         }
 
-    async def get_exchange_rate(self):
-        try:
-            async with httpx.AsyncClient() as client:
-                res = await client.get("https://open.er-api.com/v6/latest/USD")
-                return res.json()['rates']['KRW']
-        except:
-            return 1430.0
-
     # [수정] 날짜 지정 파라미터(start_date, end_date) 추가
     async def get_stock_chart(self, market: str, code: str, period: str = "D", start_date: str = "", end_date: str = ""):
         # 분봉은 별도 로직
         if "m" in period:
-            return await self._get_minute_chart(market, code, period)
+            return await self._get_live_minute_chart(market, code, period)
 
         rate = 1.0
         if market != "KR":
-            rate = await self.get_exchange_rate()
+            rate = exchange_rate_service.get_rate()
 
+        bars = await self.fetch_daily_bars(market, code, period, start_date, end_date)
+        return [to_krw_bar(bar, rate) for bar in bars or []]
+
+    async def fetch_daily_bars(self, market: str, code: str, period: str = "D", start_date: str = "", end_date: str = ""):
+        """
+        일/주/월봉 1페이지 (현지 통화 그대로, 날짜 오름차순)
+        국내: start_date ~ end_date 구간의 최근 100건 / 해외: end_date(BYMD) 이전 100건
+        조회 실패(타임아웃, 오류 응답, 서킷 열림 등)는 None, 해당 구간에 데이터가 없으면 []
+        """
         if market == "KR":
             path = "/uapi/domestic-stock/v1/quotations/inquire-daily-itemchartprice"
             tr_id = "FHKST03010100"
@@ -78,42 +92,60 @@ class KisDataService:
                 "MODP": "1"
             }
 
-        headers = await self.get_headers(tr_id)
-        
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(f"{self.base_url}{path}", headers=headers, params=params)
-                data = response.json()
-                output = data.get('output2') or data.get('output', [])
+        try:
+            headers = await self.get_headers(tr_id)
+            response = await kis_client.get(f"{self.base_url}{path}", headers=headers, params=params)
+            response.raise_for_status()
+            data = response.json()
+            if data.get("rt_cd") != "0":
+                logger.error(f"⛔ Chart Daily API Error: {data.get('msg1')}")
+                return None
+            output = data.get('output2') or data.get('output', [])
                 
-                if not output:
-                    return []
+            if not output:
+                return []
 
-                result = []
-                for item in output:
-                    dt_str = item.get("stck_bsop_date") or item.get("xymd")
-                    
-                    op = float(item.get("stck_oprc") or item.get("open") or 0) * rate
-                    hi = float(item.get("stck_hgpr") or item.get("high") or 0) * rate
-                    lo = float(item.get("stck_lwpr") or item.get("low") or 0) * rate
-                    cl = float(item.get("stck_clpr") or item.get("clos") or 0) * rate
-                    vol = float(item.get("acml_vol") or item.get("tvol") or 0)
-
-                    result.append({
-                        "time": dt_str,
-                        "open": int(op),
-                        "high": int(hi),
-                        "low": int(lo),
-                        "close": int(cl),
-                        "volume": int(vol)
-                    })
+            result = []
+            for item in output:
+                dt_str = item.get("stck_bsop_date") or item.get("xymd")
+                if not dt_str: continue
+
+                result.append({
+                    "time": dt_str,
+                    "open": float(item.get("stck_oprc") or item.get("open") or 0),
+                    "high": float(item.get("stck_hgpr") or item.get("high") or 0),
+                    "low": float(item.get("stck_lwpr") or item.get("low") or 0),
+                    "close": float(item.get("stck_clpr") or item.get("clos") or 0),
+                    "volume": int(float(item.get("acml_vol") or item.get("tvol") or 0))
+                })
                 
-                # 날짜 오름차순 정렬
-                return sorted(result, key=lambda x: x['time'])
+            # 날짜 오름차순 정렬
+            return sorted(result, key=lambda x: x['time'])
+
+        except Exception as e:
+            logger.error(f"Chart Daily Error: {e}")
+            return None
+
+    async def _get_live_minute_chart(self, market: str, code: str, period: str):
+        """
+        실시간 체결을 구독 중인 종목은 메모리 분봉(candle_store)에서 제공
+        처음 요청된 주기는 REST 분봉으로 과거 구간을 한 번 채움
+        """
+        interval = parse_interval(period)
+        if interval is None:
+            return await self._get_minute_chart(market, code, period)
 
-            except Exception as e:
-                logger.error(f"Chart Daily Error: {e}")
-                return []
+        store_market = "domestic" if market == "KR" else "overseas"
+        symbol = code[4:] if market != "KR" and len(code) >= 5 and code[0] in ['D', 'R'] else code
+
+        bars = candle_store.get_bars(store_market, symbol, interval)
+        if bars is not None:
+            return bars
+
+        # 국내 분봉 API는 1분봉만 제공하므로 요청 주기로 합침
+        bars = resample_bars(await self._get_minute_chart(market, code, period), interval)
+        seeded = candle_store.seed(store_market, symbol, interval, bars)
+        return seeded if seeded is not None else bars
 
     async def _get_minute_chart(self, market: str, code: str, period: str):
         # ... (기존 분봉 로직 유지) ...
@@ -121,7 +153,7 @@ class KisDataService:
         interval = period.replace("m", "")
         rate = 1.0
         if market != "KR":
-            rate = await self.get_exchange_rate()
+            rate = exchange_rate_service.get_rate()
 
         if market == "KR":
             path = "/uapi/domestic-stock/v1/quotations/inquire-time-itemchartprice"
@@ -158,44 +190,43 @@ class KisDataService:
 
         headers = await self.get_headers(tr_id)
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(f"{self.base_url}{path}", headers=headers, params=params)
-                data = response.json()
-                output = data.get('output2', [])
-
-                result = []
-                for item in output:
-                    if market == "KR":
-                        d_str = item.get("stck_bsop_date")
-                        t_str = item.get("stck_cntg_hour")
-                    else:
-                        d_str = item.get("kymd")
-                        t_str = item.get("khms")
+        try:
+            response = await kis_client.get(f"{self.base_url}{path}", headers=headers, params=params)
+            data = response.json()
+            output = data.get('output2', [])
+
+            result = []
+            for item in output:
+                if market == "KR":
+                    d_str = item.get("stck_bsop_date")
+                    t_str = item.get("stck_cntg_hour")
+                else:
+                    d_str = item.get("kymd")
+                    t_str = item.get("khms")
                     
-                    if not d_str or not t_str: continue
-
-                    dt_obj = datetime.datetime.strptime(f"{d_str}{t_str}", "%Y%m%d%H%M%S")
-                    dt_kst = dt_obj.replace(tzinfo=self.KST) 
-                    timestamp = int(dt_kst.timestamp())
-
-                    op = float(item.get("stck_oprc") or item.get("open") or 0) * rate
-                    hi = float(item.get("stck_hgpr") or item.get("high") or 0) * rate
-                    lo = float(item.get("stck_lwpr") or item.get("low") or 0) * rate
-                    cl = float(item.get("stck_prpr") or item.get("last") or 0) * rate
-                    vol = float(item.get("cntg_vol") or item.get("evol") or 0)
-
-                    result.append({
-                        "time": timestamp,
-                        "open": int(op),
-                        "high": int(hi),
-                        "low": int(lo),
-                        "close": int(cl),
-                        "volume": int(vol)
-                    })
-                return sorted(result, key=lambda x: x['time'])
-            except Exception as e:
-                logger.error(f"Chart Minute Error: {e}")
-                return []
+                if not d_str or not t_str: continue
+
+                dt_obj = datetime.datetime.strptime(f"{d_str}{t_str}", "%Y%m%d%H%M%S")
+                dt_kst = dt_obj.replace(tzinfo=self.KST) 
+                timestamp = int(dt_kst.timestamp())
+
+                op = float(item.get("stck_oprc") or item.get("open") or 0) * rate
+                hi = float(item.get("stck_hgpr") or item.get("high") or 0) * rate
+                lo = float(item.get("stck_lwpr") or item.get("low") or 0) * rate
+                cl = float(item.get("stck_prpr") or item.get("last") or 0) * rate
+                vol = float(item.get("cntg_vol") or item.get("evol") or 0)
+
+                result.append({
+                    "time": timestamp,
+                    "open": int(op),
+                    "high": int(hi),
+                    "low": int(lo),
+                    "close": int(cl),
+                    "volume": int(vol)
+                })
+            return sorted(result, key=lambda x: x['time'])
+        except Exception as e:
+            logger.error(f"Chart Minute Error: {e}")
+            return []
 
 kis_data = KisDataService()
\ No newline at end of file
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+
+from core.config import settings
+from services.kis.client import kis_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USD_KRW = 1430.0 # 한 번도 조회에 성공하지 못한 경우 사용하는 기본값
+
+class ExchangeRateService:
+    """
+    USD/KRW 환율 서비스
+    백그라운드에서 주기적으로 갱신하고, 조회는 캐시된 값을 동기적으로 반환
+    갱신에 실패하면 마지막으로 성공한 값을 계속 사용
+    """
+    def __init__(self):
+        self.url = settings.FX_API_URL
+        self.refresh_interval = settings.FX_REFRESH_INTERVAL
+        self.rate = DEFAULT_USD_KRW
+        self.updated_at: Optional[datetime] = None
+        self.refresh_task: Optional[asyncio.Task] = None
+
+        self.fetch_count = 0
+        self.failure_count = 0
+
+    def get_rate(self) -> float:
+        return self.rate
+
+    async def refresh(self) -> bool:
+        self.fetch_count += 1
+        try:
+            response = await kis_client.get(self.url)
+            response.raise_for_status()
+            rate = float(response.json()['rates']['KRW'])
+            if rate <= 0:
+                raise ValueError(f"invalid rate: {rate}")
+
+            self.rate = rate
+            self.updated_at = datetime.now(timezone.utc)
+            logger.info(f"✅ 환율 갱신: {self.rate} KRW/USD")
+            return True
+        except Exception as e:
+            self.failure_count += 1
+            logger.warning(f"⚠️ 환율 조회 실패, 마지막 값({self.rate})을 유지합니다: {e}")
+            return False
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    async def start(self):
+        await self.refresh()
+        if self.refresh_task is None or self.refresh_task.done():
+            self.refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self.refresh_task:
+            self.refresh_task.cancel()
+            self.refresh_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "refresh_interval": self.refresh_interval,
+            "fetch_count": self.fetch_count,
+            "failure_count": self.failure_count,
+        }
+
+exchange_rate_service = ExchangeRateService()
@@ -0,0 +1,32 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+KST = ZoneInfo("Asia/Seoul")
+
+def now_kst() -> datetime.datetime:
+    return datetime.datetime.now(KST)
+
+def is_korea_market_open(now: datetime.datetime = None) -> bool:
+    """국내 정규장 (평일 09:00 ~ 15:30, 한국시간)"""
+    now = now or now_kst()
+    if now.weekday() >= 5: return False
+    if now.hour < 9: return False
+    if now.hour == 15 and now.minute > 30: return False
+    if now.hour >= 16: return False
+    return True
+
+def is_us_market_open(now: datetime.datetime = None) -> bool:
+    """미국 정규장 (한국시간 23:00 ~ 06:00, 서머타임 미반영 근사치)"""
+    now = now or now_kst()
+    hour = now.hour
+    # 한국시간 기준 토요일 06시 이후 ~ 월요일 23시 이전은 휴장
+    if now.weekday() == 5 and hour >= 6: return False
+    if now.weekday() == 6: return False
+    if now.weekday() == 0 and hour < 23: return False
+    return (hour >= 23 or hour < 6)
+
+def is_market_open(market: str) -> bool:
+    """market: 'domestic' / 'overseas'"""
+    if market == "domestic":
+        return is_korea_market_open()
+    return is_us_market_open()
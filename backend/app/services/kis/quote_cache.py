@@ -0,0 +1,93 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+from core.config import settings
+from services.kis.market_hours import is_market_open
+from services.kis.ws_parser import Tick
+
+logger = logging.getLogger(__name__)
+
+# 웹소켓 체결(tick) 데이터로 갱신하는 시세 필드
+TICK_FIELDS = ("price", "diff", "rate", "volume", "amount")
+
+class QuoteCache:
+    """
+    현재가(inquire-price / price-detail) 응답 캐시
+    - LRU: 최대 max_size 종목까지만 보관
+    - TTL: 장중에는 짧게, 장 마감 후에는 길게 (시장별로 판단)
+    - 실시간 체결 데이터가 들어오면 해당 종목의 시세를 갱신하여 REST 호출 없이 제공
+    """
+    def __init__(self, max_size: int, ttl_open: float, ttl_closed: float):
+        self.max_size = max_size
+        self.ttl_open = ttl_open
+        self.ttl_closed = ttl_closed
+        self.entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.tick_updates = 0
+
+    def _key(self, market: str, code: str) -> Tuple[str, str]:
+        return market, code.upper()
+
+    def _ttl(self, market: str) -> float:
+        return self.ttl_open if is_market_open(market) else self.ttl_closed
+
+    def get(self, market: str, code: str) -> Optional[Dict[str, Any]]:
+        """market: 'domestic' / 'overseas'"""
+        key = self._key(market, code)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, data = entry
+        if time.monotonic() - stored_at > self._ttl(market):
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        # 호출 측에서 결과를 수정해도 캐시가 오염되지 않도록 복사본 반환
+        return dict(data)
+
+    def set(self, market: str, code: str, data: Dict[str, Any]):
+        key = self._key(market, code)
+        self.entries[key] = (time.monotonic(), dict(data))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def apply_tick(self, market: str, code: str, tick: Tick):
+        """실시간 체결(파싱된 레코드)로 캐시된 시세를 갱신 (이미 캐시된 종목만)"""
+        key = self._key(market, code)
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+
+        _, data = entry
+        for field in TICK_FIELDS:
+            value = getattr(tick, field)
+            if value is not None:
+                data[field] = value
+        self.entries[key] = (time.monotonic(), data)
+        self.tick_updates += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "tick_updates": self.tick_updates,
+        }
+
+quote_cache = QuoteCache(
+    max_size=settings.QUOTE_CACHE_MAX_SIZE,
+    ttl_open=settings.QUOTE_CACHE_TTL_OPEN,
+    ttl_closed=settings.QUOTE_CACHE_TTL_CLOSED,
+)
@@ -1,5 +1,6 @@
 import asyncio
 from services.kis.ranking.base import RankingBaseService
+from services.kis.exchange_rate import exchange_rate_service
 
 # 거래대금 순위
 # 국내: FHPST01710000
@@ -48,7 +49,7 @@ class AmountRankingService(RankingBaseService):
     
     async def get_overseas(self, nday="0", excd="NAS"):
         # 환율 조회
-        exchange_rate = await self.get_exchange_rate()
+        exchange_rate = exchange_rate_service.get_rate()
 
         params = {
             "KEYB": "",
@@ -88,7 +89,7 @@ class AmountRankingService(RankingBaseService):
 
     async def get_combined(self, excd="NAS"):
         dom_task = self.get_domestic()
-        ovs_task = self.get_overseas(excd)
+        ovs_task = self.get_overseas(excd=excd)
         
         # 병렬 실행 (이미 각 메서드에서 환산 완료됨)
         dom_res, ovs_res = await asyncio.gather(dom_task, ovs_task)
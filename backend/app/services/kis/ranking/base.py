@@ -1,7 +1,7 @@
 import logging
-import httpx
 from core.config import settings
 from services.kis.auth import kis_auth
+from services.kis.client import kis_client
 
 logger = logging.getLogger(__name__)
 
@@ -26,25 +26,12 @@ class RankingBaseService:
         headers = await self.get_headers(tr_id)
         url = f"{self.base_url}{path}"
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, headers=headers, params=params)
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                logger.error(f"⛔ API Error: {e}")
-                return {"output": []}
-            
-    async def get_exchange_rate(self):
-        url = "https://open.er-api.com/v6/latest/USD"
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url)
-                response.raise_for_status()
-                data = response.json()
-                return data['rates']['KRW']
-            except Exception as e:
-                logger.error(f"⛔ 환율 조회 실패: {e}")
-                return 1430.0 # 실패 시 기본값
+        try:
+            response = await kis_client.get(url, headers=headers, params=params)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"⛔ API Error: {e}")
+            return {"output": []}
             
 ranking_base_service = RankingBaseService()
\ No newline at end of file
@@ -0,0 +1,94 @@
+import asyncio
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class RankingCache:
+    """
+    순위 데이터 stale-while-revalidate 캐시
+    - 마지막 스냅샷을 즉시 반환하고, refresh_after가 지나면 백그라운드에서 갱신
+    - 스냅샷이 없거나 max_age보다 오래된 경우에만 갱신 완료를 기다림
+    - 같은 키의 갱신은 동시에 하나만 수행
+    """
+    def __init__(self, refresh_after: float, max_age: float):
+        self.refresh_after = refresh_after
+        self.max_age = max_age
+        self.snapshots: Dict[Hashable, Tuple[float, Dict[str, Any]]] = {}
+        self.refresh_tasks: Dict[Hashable, asyncio.Task] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def peek(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """갱신 없이 현재 스냅샷만 조회"""
+        entry = self.snapshots.get(key)
+        return entry[1] if entry else None
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        entry = self.snapshots.get(key)
+        if entry is not None:
+            fetched_at, data = entry
+            age = time.monotonic() - fetched_at
+            if age <= self.max_age:
+                if age > self.refresh_after:
+                    self.stale_hits += 1
+                    self.refresh(key, loader)
+                else:
+                    self.hits += 1
+                return data
+
+        self.misses += 1
+        return await asyncio.shield(self.refresh(key, loader))
+
+    def refresh(self, key: Hashable, loader: Callable[[], Awaitable[Dict[str, Any]]]) -> asyncio.Task:
+        """백그라운드 갱신 시작 (이미 진행 중이면 해당 작업 반환)"""
+        task = self.refresh_tasks.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(self._refresh(key, loader))
+            self.refresh_tasks[key] = task
+            task.add_done_callback(lambda t: self._on_refresh_done(key, t))
+        return task
+
+    def _on_refresh_done(self, key: Hashable, task: asyncio.Task):
+        if self.refresh_tasks.get(key) is task:
+            del self.refresh_tasks[key]
+
+    async def _refresh(self, key: Hashable, loader: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        self.refreshes += 1
+        try:
+            data = await loader()
+        except Exception as e:
+            logger.error(f"⛔ 순위 갱신 실패 {key}: {e}")
+            data = None
+
+        if data and data.get("output"):
+            self.snapshots[key] = (time.monotonic(), data)
+            return data
+
+        # 조회 실패(빈 결과) 시 기존 스냅샷 유지
+        self.refresh_failures += 1
+        previous = self.peek(key)
+        return previous if previous is not None else (data or {"output": []})
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "snapshots": len(self.snapshots),
+            "refreshing": len(self.refresh_tasks),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+        }
+
+ranking_cache = RankingCache(
+    refresh_after=settings.RANKING_CACHE_REFRESH_AFTER,
+    max_age=settings.RANKING_CACHE_MAX_AGE,
+)
@@ -1,5 +1,6 @@
 import asyncio
 from services.kis.ranking.base import RankingBaseService
+from services.kis.exchange_rate import exchange_rate_service
 
 # 급상승/급하락 순위
 # 국내: FHPST01700000
@@ -55,7 +56,7 @@ class FluctuationRankingService(RankingBaseService):
 
     async def get_overseas(self, excd="NAS", type="rising"):
         # 환율 조회
-        exchange_rate = await self.get_exchange_rate()
+        exchange_rate = exchange_rate_service.get_rate()
 
         # 해외 상승율/하락율 (0:하락, 1:상승)
         gubun = "1" if type == "rising" else "0"
@@ -1,5 +1,6 @@
 import asyncio
 from services.kis.ranking.base import RankingBaseService
+from services.kis.exchange_rate import exchange_rate_service
 
 # 시가총액 순위
 # 국내: FHPST01740000
@@ -51,7 +52,7 @@ class MarketCapRankingService(RankingBaseService):
     
     async def get_overseas(self, excd="NAS"):
         # 환율 조회
-        exchange_rate = await self.get_exchange_rate()
+        exchange_rate = exchange_rate_service.get_rate()
 
         params = {
             "KEYB": "",
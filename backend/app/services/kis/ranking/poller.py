@@ -0,0 +1,193 @@
+import asyncio
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from core.config import settings
+from services.kis.market_hours import is_korea_market_open, is_us_market_open
+from services.kis.ranking.cache import ranking_cache
+from services.kis.ranking.volume import volume_service
+from services.kis.ranking.amount import amount_service
+from services.kis.ranking.market_cap import mkt_cap_service
+from services.kis.ranking.fluctuation import fluct_service
+
+logger = logging.getLogger(__name__)
+
+RANKING_SERVICES = {
+    "volume": volume_service,
+    "amount": amount_service,
+    "market-cap": mkt_cap_service,
+    "fluctuation": fluct_service,
+}
+
+PUSH_LIMIT = 30 # 클라이언트에 전송하는 순위 개수
+
+RankingKey = Tuple[str, str, str, Optional[str]] # (ranking, market, excd, direction)
+
+RANKING_MARKETS = ("domestic", "overseas", "all")
+RANKING_EXCHANGES = ("NAS", "NYS", "AMS") # 해외 순위 거래소코드 (나스닥, 뉴욕, 아멕스)
+RANKING_DIRECTIONS = ("rising", "falling") # 등락률 순위 방향 (급상승, 급하락)
+
+# 별도 구독이 없어도 항상 갱신하는 기본 순위 (홈 화면 기본값)
+DEFAULT_KEYS: List[RankingKey] = [
+    ("volume", "all", "NAS", None),
+    ("amount", "all", "NAS", None),
+    ("market-cap", "all", "NAS", None),
+    ("fluctuation", "all", "NAS", "rising"),
+    ("fluctuation", "all", "NAS", "falling"),
+]
+
+def ranking_key(ranking: str, market: str, excd: str = "NAS", direction: Optional[str] = None) -> Optional[RankingKey]:
+    """
+    순위 종류/시장/거래소/방향 검증 후 캐시·폴러 공용 키 반환. 지원하지 않는 값이면 None
+    direction은 등락률(fluctuation) 순위에만 사용 (기본 rising), 국내 순위는 거래소코드를 무시
+    """
+    excd = (excd or "NAS").upper()
+    if ranking not in RANKING_SERVICES or market not in RANKING_MARKETS or excd not in RANKING_EXCHANGES:
+        return None
+    if ranking == "fluctuation":
+        direction = direction or "rising"
+        if direction not in RANKING_DIRECTIONS:
+            return None
+    elif direction is not None:
+        return None
+    return (ranking, market, "NAS" if market == "domestic" else excd, direction)
+
+def ranking_loader(key: RankingKey) -> Callable[[], Awaitable[Dict[str, Any]]]:
+    """순위 키에 맞는 조회 함수 반환 (market: domestic / overseas / all)"""
+    ranking, market, excd, direction = key
+    service = RANKING_SERVICES[ranking]
+    kwargs = {"type": direction} if ranking == "fluctuation" else {}
+
+    if market == "domestic":
+        return lambda: service.get_domestic(**kwargs)
+    elif market == "overseas":
+        return lambda: service.get_overseas(excd=excd, **kwargs)
+    return lambda: service.get_combined(excd=excd, **kwargs)
+
+def key_to_dict(key: RankingKey) -> Dict[str, Any]:
+    ranking, market, excd, direction = key
+    return {"ranking": ranking, "market": market, "excd": excd, "direction": direction}
+
+class RankingPoller:
+    """
+    순위 스냅샷 백그라운드 폴러
+    장 운영 시간에 맞춰 주기적으로 순위를 갱신(ranking_cache)하고, 구독 중인 웹소켓 클라이언트에 변경분만 전송
+    사용자 수와 무관하게 KIS 호출량이 일정하게 유지됨
+    """
+    def __init__(self):
+        self.interval_open = settings.RANKING_POLL_INTERVAL_OPEN
+        self.interval_closed = settings.RANKING_POLL_INTERVAL_CLOSED
+
+        self.listeners: Dict[RankingKey, Set[Callable]] = {}
+        self.last_pushed: Dict[RankingKey, List[Dict[str, Any]]] = {}
+        self.last_polled: Dict[RankingKey, float] = {}
+        self.task: Optional[asyncio.Task] = None
+
+        self.polls = 0
+        self.pushes = 0
+
+    def _interval(self, key: RankingKey) -> float:
+        market = key[1]
+        if market == "domestic":
+            is_open = is_korea_market_open()
+        elif market == "overseas":
+            is_open = is_us_market_open()
+        else:
+            is_open = is_korea_market_open() or is_us_market_open()
+        return self.interval_open if is_open else self.interval_closed
+
+    async def subscribe(self, key: RankingKey, callback: Callable) -> Dict[str, Any]:
+        """구독 등록 후 현재 스냅샷 전체를 담은 메시지를 반환"""
+        self.listeners.setdefault(key, set()).add(callback)
+        data = await ranking_cache.get(key, ranking_loader(key))
+        output = data.get("output", [])[:PUSH_LIMIT]
+        self.last_pushed.setdefault(key, output)
+        return {"type": "ranking", **key_to_dict(key), "full": True, "output": output}
+
+    def unsubscribe(self, key: RankingKey, callback: Callable):
+        listeners = self.listeners.get(key)
+        if listeners is None:
+            return
+        listeners.discard(callback)
+        if not listeners:
+            del self.listeners[key]
+
+    def remove_listener(self, callback: Callable):
+        for key in list(self.listeners):
+            self.unsubscribe(key, callback)
+
+    def _diff(self, previous: List[Dict[str, Any]], current: List[Dict[str, Any]]) -> List[Tuple[int, Dict[str, Any]]]:
+        """순위(index)별로 바뀐 항목만 추출"""
+        changes = []
+        for rank, item in enumerate(current):
+            if rank >= len(previous) or previous[rank] != item:
+                changes.append((rank, item))
+        return changes
+
+    async def _poll(self, key: RankingKey):
+        self.polls += 1
+        data = await ranking_cache.refresh(key, ranking_loader(key))
+        output = data.get("output", [])[:PUSH_LIMIT]
+
+        previous = self.last_pushed.get(key, [])
+        changes = self._diff(previous, output)
+        if not changes and len(previous) == len(output):
+            return
+        self.last_pushed[key] = output
+
+        message = {
+            "type": "ranking",
+            **key_to_dict(key),
+            "full": False,
+            "length": len(output),
+            "changes": [[rank, item] for rank, item in changes],
+        }
+        for callback in list(self.listeners.get(key, ())):
+            try:
+                callback(message)
+                self.pushes += 1
+            except Exception:
+                pass
+
+    async def _poll_loop(self):
+        while True:
+            now = time.monotonic()
+            keys = set(DEFAULT_KEYS) | set(self.listeners)
+            due = [key for key in keys if now - self.last_polled.get(key, 0) >= self._interval(key)]
+
+            for key in due:
+                self.last_polled[key] = now
+            if due:
+                results = await asyncio.gather(*[self._poll(key) for key in due], return_exceptions=True)
+                for key, result in zip(due, results):
+                    if isinstance(result, Exception):
+                        logger.error(f"⛔ 순위 폴링 실패 {key}: {result}")
+
+            # 구독이 끝난 순위의 상태 정리
+            for key in list(self.last_pushed):
+                if key not in keys:
+                    self.last_pushed.pop(key, None)
+                    self.last_polled.pop(key, None)
+
+            await asyncio.sleep(1)
+
+    async def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._poll_loop())
+            logger.info("✅ 순위 폴러가 시작되었습니다.")
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "watched_keys": len(self.listeners),
+            "listeners": sum(len(listeners) for listeners in self.listeners.values()),
+            "polls": self.polls,
+            "pushes": self.pushes,
+        }
+
+ranking_poller = RankingPoller()
@@ -0,0 +1,155 @@
+import asyncio
+import time
+import logging
+import contextvars
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive" # 사용자 요청 (API, 웹소켓)
+PRIORITY_BATCH = "batch" # 학습 데이터 수집 등 백그라운드 작업
+
+# 현재 실행 컨텍스트의 요청 우선순위 (asyncio.gather로 만든 하위 태스크에도 전파됨)
+_request_priority = contextvars.ContextVar("kis_request_priority", default=PRIORITY_INTERACTIVE)
+
+def set_request_priority(priority: str):
+    """현재 컨텍스트(스크립트의 main 등) 전체의 KIS 요청 우선순위를 지정"""
+    _request_priority.set(priority)
+
+@contextmanager
+def batch_priority():
+    """with 블록 안의 KIS 요청을 배치 우선순위로 처리"""
+    token = _request_priority.set(PRIORITY_BATCH)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+class TokenBucket:
+    """
+    예약(reservation) 방식의 토큰 버킷
+    토큰을 즉시 차감하고, 토큰이 생길 때까지 기다려야 하는 시간을 돌려주므로 호출 순서대로(FIFO) 대기열이 형성됨
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+class KisRateLimiter:
+    """
+    KIS REST 호출 전역 속도 제한기
+    - 앱키별 버킷: 앱키 단위 초당 호출 한도 (KIS_APP_RATE_LIMITS로 앱키마다 다르게 지정 가능)
+    - TR ID별 버킷: 설정(KIS_TR_RATE_LIMITS)에 지정된 TR만 별도 한도 적용 (앱키마다 따로, 다른 앱키의 호출과 경쟁하지 않음)
+    - 배치 버킷: 배치 작업은 앱키 한도의 일부(KIS_BATCH_RATE_SHARE)까지만 사용하여 사용자 요청 몫을 보장
+    """
+    def __init__(self):
+        self.rate = settings.KIS_RATE_LIMIT_PER_SEC
+        self.burst = settings.KIS_RATE_LIMIT_BURST
+        self.batch_share = settings.KIS_BATCH_RATE_SHARE
+        self.tr_limits = settings.KIS_TR_RATE_LIMITS
+        self.app_limits = settings.KIS_APP_RATE_LIMITS
+
+        self.app_buckets: Dict[str, TokenBucket] = {}
+        self.batch_buckets: Dict[str, TokenBucket] = {}
+        self.tr_buckets: Dict[Tuple[str, str], TokenBucket] = {} # (앱키, TR ID) → 버킷
+
+        self.stats = {
+            priority: {"requests": 0, "delayed": 0, "waiting": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for priority in (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+        }
+
+    def _app_rate(self, app_key: str) -> Tuple[float, float]:
+        """앱키의 (초당 한도, 버스트). 앱키별 설정이 있으면 버스트도 같은 값"""
+        rate = self.app_limits.get(app_key)
+        if rate is None:
+            return self.rate, self.burst
+        return rate, max(rate, 1)
+
+    def _app_bucket(self, app_key: str) -> TokenBucket:
+        bucket = self.app_buckets.get(app_key)
+        if bucket is None:
+            bucket = self.app_buckets[app_key] = TokenBucket(*self._app_rate(app_key))
+        return bucket
+
+    def _batch_bucket(self, app_key: str) -> TokenBucket:
+        bucket = self.batch_buckets.get(app_key)
+        if bucket is None:
+            rate = max(self._app_rate(app_key)[0] * self.batch_share, 0.1)
+            bucket = self.batch_buckets[app_key] = TokenBucket(rate, 1)
+        return bucket
+
+    def _tr_bucket(self, app_key: str, tr_id: str) -> Optional[TokenBucket]:
+        if tr_id not in self.tr_limits:
+            return None
+        bucket = self.tr_buckets.get((app_key, tr_id))
+        if bucket is None:
+            rate = self.tr_limits[tr_id]
+            bucket = self.tr_buckets[(app_key, tr_id)] = TokenBucket(rate, max(rate, 1))
+        return bucket
+
+    async def _wait(self, bucket: TokenBucket) -> float:
+        delay = bucket.reserve(time.monotonic())
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    async def acquire(self, tr_id: Optional[str] = None, app_key: Optional[str] = None, priority: Optional[str] = None):
+        """호출 한도 내에서 요청을 보낼 수 있을 때까지 대기"""
+        app_key = app_key or settings.KIS_APP_KEY
+        priority = priority or _request_priority.get()
+        stats = self.stats[priority]
+
+        stats["requests"] += 1
+        stats["waiting"] += 1
+        started = time.monotonic()
+        try:
+            # 좁은 범위의 버킷부터 통과시키고, 실제 호출 직전에 앱키 전역 버킷을 통과
+            if priority == PRIORITY_BATCH:
+                await self._wait(self._batch_bucket(app_key))
+
+            tr_bucket = self._tr_bucket(app_key, tr_id) if tr_id else None
+            if tr_bucket:
+                await self._wait(tr_bucket)
+
+            await self._wait(self._app_bucket(app_key))
+        finally:
+            stats["waiting"] -= 1
+            waited = time.monotonic() - started
+            if waited > 0.001:
+                stats["delayed"] += 1
+            stats["total_wait"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+
+    def get_stats(self) -> Dict[str, Any]:
+        result = {
+            "rate_per_sec": self.rate,
+            "burst": self.burst,
+            "batch_share": self.batch_share,
+            "tr_limits": self.tr_limits,
+            # 앱키는 앞 4자리만 노출
+            "app_limits": {f"{app_key[:4]}***": rate for app_key, rate in self.app_limits.items()},
+        }
+        for priority, stats in self.stats.items():
+            requests = stats["requests"]
+            result[priority] = {
+                "requests": requests,
+                "delayed": stats["delayed"],
+                "waiting": stats["waiting"],
+                "avg_wait_ms": round(stats["total_wait"] / requests * 1000, 2) if requests else 0.0,
+                "max_wait_ms": round(stats["max_wait"] * 1000, 2),
+            }
+        return result
+
+kis_rate_limiter = KisRateLimiter()
@@ -0,0 +1,287 @@
+import asyncio
+import itertools
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from core.config import settings
+from services.kis.ws_parser import TICK_KEYS, Record, Tick
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "conflate", "disconnect")
+
+class RelayStats:
+    """전체 클라이언트 송신 큐 통계 (종료된 연결 포함 누적)"""
+    def __init__(self):
+        self.active = 0
+        self.sent = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.disconnected = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "active_clients": self.active,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+            "disconnected": self.disconnected,
+        }
+
+relay_stats = RelayStats()
+
+# --- 전송 형식 ---
+# json: {"type": "realtime", "data": {...}, "batch": [...]} (기본)
+# raw: 실시간 데이터 dict 그대로 (/ws/stocks/{market}/{code})
+# compact: 위치 기반 배열 + 숫자 값 (연결 시 ?format=compact 로 선택, 처음에 schema 메시지 전송)
+WIRE_FORMATS = ("json", "raw", "compact")
+
+COMPACT_TEXT_FIELDS = {"code", "time", "date"}
+COMPACT_SCHEMA = {
+    "type": "schema",
+    "format": "compact",
+    "tick": ["t", *TICK_KEYS],
+    "ask": ["a", "code", "time", "ask_prices", "bid_prices", "ask_remains", "bid_remains"],
+    "batch": ["b", "records"],
+}
+
+def dumps(obj) -> str:
+    # Starlette send_json과 같은 설정
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+def _number(value):
+    # 대부분 정수 문자열이므로 예외 없이 판별되는 경로를 먼저 사용
+    if isinstance(value, str):
+        if value.isdigit() or (value[:1] == "-" and value[1:].isdigit()):
+            return int(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+COMPACT_TEXT_POSITIONS = frozenset(i for i, key in enumerate(TICK_KEYS) if key in COMPACT_TEXT_FIELDS)
+
+def compact_record(record: Record) -> list:
+    """파싱된 레코드 → compact 배열 (dict를 거치지 않음)"""
+    if isinstance(record, Tick):
+        return ["t"] + [value if i in COMPACT_TEXT_POSITIONS else _number(value) for i, value in enumerate(record[1:])]
+    return [
+        "a", record.code, record.time,
+        [_number(value) for value in record.ask_prices],
+        [_number(value) for value in record.bid_prices],
+        [_number(value) for value in record.ask_remains],
+        [_number(value) for value in record.bid_remains],
+    ]
+
+class RealtimeMessage:
+    """
+    실시간 데이터 1건 (같은 종목을 보는 모든 클라이언트가 공유)
+    파싱된 레코드(한 프레임의 같은 종목 레코드, 시간순)를 그대로 들고 있다가
+    dict 변환과 전송 형식별 인코딩은 처음 요청될 때 한 번만 수행하고 재사용
+    """
+    __slots__ = ("records", "_data", "_batch", "_encoded")
+
+    def __init__(self, records: List[Record]):
+        self.records = records
+        self._data: Optional[Dict[str, Any]] = None
+        self._batch: Optional[list] = None
+        self._encoded: Dict[str, str] = {}
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """최신 레코드"""
+        if self._data is None:
+            self._data = self.batch[-1] if len(self.records) > 1 else self.records[-1].to_dict()
+        return self._data
+
+    @property
+    def batch(self) -> Optional[list]:
+        """한 프레임에 여러 건이 온 경우 전체 레코드 목록 (시간순), 1건이면 None"""
+        if self._batch is None and len(self.records) > 1:
+            self._batch = [record.to_dict() for record in self.records]
+        return self._batch
+
+    @property
+    def conflation_key(self) -> Hashable:
+        record = self.records[-1]
+        return "tick" if isinstance(record, Tick) else "ask", record.code
+
+    def encode(self, wire_format: str) -> str:
+        encoded = self._encoded.get(wire_format)
+        if encoded is None:
+            encoded = self._encoded[wire_format] = dumps(self._build(wire_format))
+        return encoded
+
+    def _build(self, wire_format: str):
+        if wire_format == "compact":
+            if len(self.records) > 1:
+                return ["b", [compact_record(record) for record in self.records]]
+            return compact_record(self.records[-1])
+        if wire_format == "raw":
+            return {**self.data, "batch": self.batch} if self.batch else self.data
+        message = {"type": "realtime", "data": self.data}
+        if self.batch:
+            message["batch"] = self.batch
+        return message
+
+def conflation_key(message) -> Optional[Hashable]:
+    """같은 종목·같은 종류(체결/호가)의 실시간 메시지, 같은 봉의 분봉 갱신은 최신 값 하나로 합칠 수 있음"""
+    if isinstance(message, RealtimeMessage):
+        return message.conflation_key
+    if message.get("type") == "candle" and not message.get("full"):
+        return "candle", message.get("market"), message.get("code"), message.get("period"), message["bar"]["time"]
+    if message.get("type") not in ("tick", "ask"):
+        return None
+    return message["type"], message.get("code")
+
+class ClientSendQueue:
+    """
+    다운스트림 웹소켓 클라이언트별 송신 큐
+    KIS 수신 루프는 push()로 큐에 넣기만 하고, 실제 전송은 클라이언트별 drain task가 수행
+    느린 클라이언트가 다른 클라이언트나 KIS 수신을 지연시키지 않도록 큐 크기를 제한하고 넘치면 정책에 따라 처리
+    - drop_oldest: 가장 오래된 메시지 버림
+    - conflate: 같은 종목의 대기 중인 실시간 메시지를 최신 값으로 교체 (같은 종목이 없으면 가장 오래된 메시지 버림)
+    - disconnect: 연결 종료
+    실시간 데이터(RealtimeMessage)는 클라이언트의 전송 형식(wire_format)으로 인코딩된 공유 문자열을 전송
+    conflate_ms를 지정하면 체결/호가를 종목별로 해당 시간 동안 병합하여 최신 값만 전송 (초당 전송 횟수 제한)
+    """
+    _ids = itertools.count()
+
+    def __init__(self, websocket, max_size: int = None, policy: str = None, conflate_ms: int = None, wire_format: str = "json"):
+        self.websocket = websocket
+        self.wire_format = wire_format if wire_format in WIRE_FORMATS else "json"
+        self.max_size = max_size or settings.WS_CLIENT_QUEUE_SIZE
+        self.policy = policy if policy in OVERFLOW_POLICIES else settings.WS_CLIENT_OVERFLOW_POLICY
+
+        self.pending: "OrderedDict[int, Tuple[Optional[Hashable], Dict[str, Any]]]" = OrderedDict() # id → (병합 키, 메시지)
+        self.pending_keys: Dict[Hashable, int] = {} # 병합 키 → 대기 중인 가장 최근 메시지 id
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.closed = False
+
+        # 시간 단위 병합: conflate_ms 동안 들어온 체결/호가는 종목별 최신 값만 모아서 전송
+        self.latest: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.set_conflation(settings.WS_CONFLATE_MS if conflate_ms is None else conflate_ms)
+
+        self.sent = 0
+        self.dropped = 0
+        self.conflated = 0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._drain())
+            relay_stats.active += 1
+
+    def set_conflation(self, conflate_ms: int):
+        """conflate_ms: 0이면 병합 없이 즉시 전송"""
+        self.conflate_ms = max(0, int(conflate_ms or 0))
+        if not self.conflate_ms:
+            self._flush()
+
+    def push(self, message):
+        """대기 없이 큐에 추가 (KIS 수신 루프에서 호출)"""
+        if self.closed:
+            return
+
+        key = conflation_key(message)
+        if self.conflate_ms and key is not None:
+            if key in self.latest:
+                self.conflated += 1
+                relay_stats.conflated += 1
+            self.latest[key] = message
+            if self.flush_handle is None:
+                self.flush_handle = asyncio.get_running_loop().call_later(self.conflate_ms / 1000, self._flush)
+            return
+
+        self._enqueue(key if self.policy == "conflate" else None, message)
+
+    def _flush(self):
+        self.flush_handle = None
+        latest, self.latest = self.latest, OrderedDict()
+        for key, message in latest.items():
+            self._enqueue(key if self.policy == "conflate" else None, message)
+
+    def _enqueue(self, key: Optional[Hashable], message: Dict[str, Any]):
+        if self.closed:
+            return
+
+        if len(self.pending) >= self.max_size:
+            if key is not None and key in self.pending_keys:
+                # 넘칠 때만 같은 종목의 대기 메시지를 최신 값으로 교체
+                self.pending[self.pending_keys[key]] = (key, message)
+                self.conflated += 1
+                relay_stats.conflated += 1
+                return
+            if self.policy == "disconnect":
+                logger.warning(f"⚠️ 클라이언트 송신 큐 초과로 연결을 종료합니다. (대기 {len(self.pending)}건)")
+                relay_stats.disconnected += 1
+                self.closed = True
+                asyncio.create_task(self.close(code=1013))
+                return
+            self._pop()
+            self.dropped += 1
+            relay_stats.dropped += 1
+
+        message_id = next(self._ids)
+        self.pending[message_id] = (key, message)
+        if key is not None:
+            self.pending_keys[key] = message_id
+        self.ready.set()
+
+    def _pop(self) -> Dict[str, Any]:
+        message_id, (key, message) = self.pending.popitem(last=False)
+        if key is not None and self.pending_keys.get(key) == message_id:
+            del self.pending_keys[key]
+        return message
+
+    async def _drain(self):
+        try:
+            while not self.closed:
+                await self.ready.wait()
+                while self.pending:
+                    message = self._pop()
+                    if isinstance(message, RealtimeMessage):
+                        await self.websocket.send_text(message.encode(self.wire_format))
+                    else:
+                        await self.websocket.send_json(message)
+                    self.sent += 1
+                    relay_stats.sent += 1
+                self.ready.clear()
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # 전송 실패 = 연결 끊김. 수신 루프에서 정리
+            self.closed = True
+
+    async def close(self, code: int = 1000):
+        if self.closed and self.task is None:
+            return
+        self.closed = True
+        self.pending.clear()
+        self.pending_keys.clear()
+        self.latest.clear()
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if self.task:
+            self.task.cancel()
+            self.task = None
+            relay_stats.active -= 1
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "wire_format": self.wire_format,
+            "conflate_ms": self.conflate_ms,
+            "queued": len(self.pending),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+        }
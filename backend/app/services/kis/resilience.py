@@ -0,0 +1,121 @@
+import time
+import random
+import logging
+import httpx
+from urllib.parse import urlsplit
+from typing import Dict, Any
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 재시도 대상 HTTP 상태 코드
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# 재시도 대상 KIS 응답 코드 (msg_cd)
+# EGW00201: 초당 거래건수를 초과하였습니다.
+RETRYABLE_MSG_CODES = {"EGW00201"}
+
+# 엔드포인트(경로 일부)별 타임아웃 (초). 일치하는 항목이 없으면 KIS_HTTP_TIMEOUT 사용
+DEFAULT_ENDPOINT_TIMEOUTS = {
+    "/quotations/inquire-price": 3.0,
+    "/quotations/price-detail": 3.0,
+    "/quotations/intstock-multprice": 3.0,
+    "/quotations/inquire-time-itemconclusion": 5.0,
+    "/quotations/inquire-ccnl": 5.0,
+    "/quotations/volume-rank": 5.0,
+    "/ranking/": 5.0,
+    "itemchartprice": 8.0,
+    "/quotations/dailyprice": 8.0,
+}
+
+class KisCircuitOpenError(Exception):
+    """서킷 브레이커가 열려 있어 KIS 호출을 즉시 실패 처리한 경우"""
+    pass
+
+class CircuitBreaker:
+    """
+    엔드포인트 단위 서킷 브레이커
+    - closed: 정상 호출
+    - open: 연속 실패가 임계치를 넘으면 reset_timeout 동안 호출 없이 즉시 실패
+    - half_open: reset_timeout 이후 한 건만 시험 호출, 성공하면 closed / 실패하면 다시 open
+    """
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self.probe_in_flight = False
+        # half_open: 시험 호출은 한 번에 하나만
+        if self.probe_in_flight:
+            return False
+        self.probe_in_flight = True
+        return True
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info(f"✅ KIS 서킷 복구: {self.name}")
+        self.state = "closed"
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"⚠️ KIS 서킷 열림: {self.name} (연속 실패 {self.failures}회)")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures}
+
+def endpoint_of(url: str) -> str:
+    return urlsplit(url).path
+
+def timeout_for(url: str) -> float:
+    timeouts = {**DEFAULT_ENDPOINT_TIMEOUTS, **settings.KIS_ENDPOINT_TIMEOUTS}
+    for pattern, timeout in timeouts.items():
+        if pattern in url:
+            return timeout
+    return settings.KIS_HTTP_TIMEOUT
+
+def backoff_delay(attempt: int) -> float:
+    """지수 백오프 + full jitter"""
+    ceiling = min(settings.KIS_RETRY_BACKOFF_MAX, settings.KIS_RETRY_BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+def is_retryable_exception(e: Exception) -> bool:
+    return isinstance(e, (httpx.TimeoutException, httpx.TransportError))
+
+def is_retryable_response(response: httpx.Response) -> bool:
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        return True
+    try:
+        body = response.json()
+    except Exception:
+        return False
+    return isinstance(body, dict) and body.get("msg_cd") in RETRYABLE_MSG_CODES
+
+def is_success_response(response: httpx.Response) -> bool:
+    """HTTP 200 이면서 KIS rt_cd가 성공(0)인 응답"""
+    if response.status_code != 200:
+        return False
+    try:
+        body = response.json()
+    except Exception:
+        return False
+    return isinstance(body, dict) and body.get("rt_cd") == "0"
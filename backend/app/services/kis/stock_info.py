@@ -1,14 +1,23 @@
-import httpx
+import asyncio
 import logging
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 from core.config import settings
 from services.kis.auth import kis_auth
-from services.kis.ranking.base import ranking_base_service
+from services.kis.client import kis_client
+from services.kis.exchange_rate import exchange_rate_service
+from services.kis.quote_cache import quote_cache
+from services.kis.tick_store import tick_store
 
 logger = logging.getLogger(__name__)
 
+DOMESTIC_MARKETS = ["domestic", "kospi", "kosdaq"]
+OVERSEAS_EXCHANGES = ["NAS", "NYS", "AMS"]
+MULTI_PRICE_MAX_SYMBOLS = 30 # 관심종목(멀티종목) 시세조회 1회 최대 종목 수
+QUOTE_CONCURRENCY = 5 # 개별 조회로 대체할 때 동시 호출 수
+HISTORY_SIZE = 30 # 종목 상세의 체결 내역 건수
+
 class StockInfoService:
     def __init__(self):
         self.base_url = settings.KIS_BASE_URL
@@ -27,27 +36,67 @@ class StockInfoService:
         result = None
         if market.lower() in ["domestic", "kospi", "kosdaq"]:
             result = await self._get_domestic_stock(code)
-            # 국내주식 체결 내역 추가 조회
+            # 국내주식 체결 내역 추가 (실시간 구독 중인 종목은 메모리에서 제공)
             if result:
-                history = await self.get_domestic_stock_time_conclusion(code)
-                result['history'] = history if history else []
+                result['history'] = await self._get_history("domestic", code)
         
         elif market.lower() in ["overseas", "nas", "nasdaq"]:
             if not exchange:
                 exchange = "NAS" 
             result = await self._get_overseas_stock(code, exchange)
-            # 해외주식 체결 내역 추가 조회
+            # 해외주식 체결 내역 추가 (실시간 구독 중인 종목은 메모리에서 제공)
             if result:
-                history = await self.get_overseas_stock_conclusion(code, exchange)
-                result['history'] = history if history else []
+                result['history'] = await self._get_history("overseas", code, exchange)
         
         else:
             logger.error(f"잘못된 시장 구분입니다: {market}")
             return None
         
         return result
+
+    async def _get_history(self, market: str, code: str, exchange: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        최근 체결 내역 {time, price, diff, rate, volume} (최신순)
+        실시간 체결 버퍼가 있으면 메모리에서, 없으면 REST로 조회 후 버퍼의 과거 구간을 채움
+        """
+        history = tick_store.get_history(market, code, HISTORY_SIZE)
+        if history is not None:
+            return history
+
+        if market == "domestic":
+            rows = await self.get_domestic_stock_time_conclusion(code)
+            history = [
+                {
+                    "time": row.get("stck_cntg_hour"),
+                    "price": row.get("stck_prpr"),
+                    "diff": row.get("prdy_vrss"),
+                    "rate": row.get("prdy_ctrt"),
+                    "volume": row.get("cnqn"), # 체결량
+                }
+                for row in rows or []
+            ]
+        else:
+            rows = await self.get_overseas_stock_conclusion(code, exchange)
+            rate = exchange_rate_service.get_rate()
+            history = [
+                {
+                    "time": row.get("khms"), # 한국 기준 시간
+                    "price": str(int(float(row.get("last") or 0) * rate)),
+                    "diff": str(int(float(row.get("diff") or 0) * rate)),
+                    "rate": row.get("rate"),
+                    "volume": row.get("evol"), # 체결량
+                }
+                for row in rows or []
+            ]
+
+        tick_store.seed(market, code, history)
+        return history[:HISTORY_SIZE]
         
     async def _get_domestic_stock(self, code: str) -> Optional[Dict[str, Any]]:
+        cached = quote_cache.get("domestic", code)
+        if cached:
+            return cached
+
         tr_id = "FHKST01010100"
         url = f"{self.base_url}/uapi/domestic-stock/v1/quotations/inquire-price"
 
@@ -58,40 +107,45 @@ class StockInfoService:
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=headers, params=params)
-                response.raise_for_status()
-                res_json = response.json()
-
-                if res_json["rt_cd"] != "0": # 성공 실패 여부 응답
-                    logger.error(f"⛔ Domestic API Error: {res_json['msg1']}")
-                    return None
+            response = await kis_client.get(url, headers=headers, params=params)
+            response.raise_for_status()
+            res_json = response.json()
+
+            if res_json["rt_cd"] != "0": # 성공 실패 여부 응답
+                logger.error(f"⛔ Domestic API Error: {res_json['msg1']}")
+                return None
                 
-                data = res_json["output"]
+            data = res_json["output"]
 
-                market_cap_eok = int(data.get("hts_avls") or 0)
-                market_cap_won = str(market_cap_eok * 100000000)
+            market_cap_eok = int(data.get("hts_avls") or 0)
+            market_cap_won = str(market_cap_eok * 100000000)
 
-                return {
-                    "market": "domestic",
-                    "market_name": data.get("rprs_mrkt_kor_name"), # 대표 시장 한글 명 (KOSPI200...)
-                    "code": code,
-                    "price": data.get("stck_prpr"), # 주식 현재가
-                    "diff": data.get("prdy_vrss"), # 전일 대비
-                    "rate": data.get("prdy_ctrt"), # 전일 대비율
-                    "amount": data.get("acml_tr_pbmn"), # 누적 거래 대금
-                    "volume": data.get("acml_vol"), # 누적 거래량
-                    "shares_outstanding": data.get("lstn_stcn"), # 상장 주수
-                    "market_cap": market_cap_won, # HTS 시가총액
-                    "per": data.get("per"), "pbr": data.get("pbr"), "eps": data.get("eps"), "bps": data.get("bps"),
-                    "vol_power": data.get("vol_tnrt") # 거래량 회전율
-                }
+            result = {
+                "market": "domestic",
+                "market_name": data.get("rprs_mrkt_kor_name"), # 대표 시장 한글 명 (KOSPI200...)
+                "code": code,
+                "price": data.get("stck_prpr"), # 주식 현재가
+                "diff": data.get("prdy_vrss"), # 전일 대비
+                "rate": data.get("prdy_ctrt"), # 전일 대비율
+                "amount": data.get("acml_tr_pbmn"), # 누적 거래 대금
+                "volume": data.get("acml_vol"), # 누적 거래량
+                "shares_outstanding": data.get("lstn_stcn"), # 상장 주수
+                "market_cap": market_cap_won, # HTS 시가총액
+                "per": data.get("per"), "pbr": data.get("pbr"), "eps": data.get("eps"), "bps": data.get("bps"),
+                "vol_power": data.get("vol_tnrt") # 거래량 회전율
+            }
+            quote_cache.set("domestic", code, result)
+            return result
         
         except Exception as e:
             logger.error(f"⛔ Faild to fetch domestic stock: {e}")
             return None
         
     async def _get_overseas_stock(self, code: str, exchange: str) -> Optional[Dict[str, Any]]:
+        cached = quote_cache.get("overseas", code)
+        if cached:
+            return cached
+
         tr_id = "HHDFS76200200"
         url = f"{self.base_url}/uapi/overseas-price/v1/quotations/price-detail"
 
@@ -103,55 +157,157 @@ class StockInfoService:
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=headers, params=params)
-                response.raise_for_status()
-                res_json = response.json()
+            response = await kis_client.get(url, headers=headers, params=params)
+            response.raise_for_status()
+            res_json = response.json()
 
-                if res_json["rt_cd"] != "0":
-                    logger.error(f"⛔ Overseas API Error: {res_json['msg1']}")
+            if res_json["rt_cd"] != "0":
+                logger.error(f"⛔ Overseas API Error: {res_json['msg1']}")
                 
-                data = res_json["output"]
-                rate = await ranking_base_service.get_exchange_rate()
-
-                last = float(data.get('last') or 0)  # 현재가
-                base = float(data.get('base') or 0)  # 전일종가
-                amount = float(data.get('tamt') or 0)
-                tomv = float(data.get('tomv') or 0)  # 시가총액
-                eps_usd = float(data.get('epsx') or 0) # EPS
-                bps_usd = float(data.get('bpsx') or 0) # BPS
+            data = res_json["output"]
+            rate = exchange_rate_service.get_rate()
+
+            last = float(data.get('last') or 0)  # 현재가
+            base = float(data.get('base') or 0)  # 전일종가
+            amount = float(data.get('tamt') or 0)
+            tomv = float(data.get('tomv') or 0)  # 시가총액
+            eps_usd = float(data.get('epsx') or 0) # EPS
+            bps_usd = float(data.get('bpsx') or 0) # BPS
                 
-                diff_usd = last - base
-                if base > 0:
-                    change_rate = f"{((diff_usd / base) * 100):.2f}"
-                else:
-                    change_rate = "0.00"
-
-                price_krw = int(last * rate)
-                diff_krw = int(diff_usd * rate)
-                amount_krw = int(amount * rate)
-                market_cap_krw_eok = (tomv * rate)
-                eps_krw = int(eps_usd * rate)
-                bps_krw = int(bps_usd * rate)
-
-                return {
-                    "market": "overseas",
-                    "market_name": "NAS",
-                    "code": code,
-                    "price": str(price_krw), # 주식 현재가
-                    "diff": str(diff_krw), # 전일 대비
-                    "rate": str(change_rate), # 전일 대비율
-                    "amount": str(amount_krw), # 거래 대금
-                    "volume": data.get("tvol"), # 거래량
-                    "shares_outstanding": data.get("shar"), # 상장 주수
-                    "market_cap": str(int(market_cap_krw_eok)), # 시가총액
-                    "per": data.get("perx"), "pbr": data.get("pbrx"), "eps": str(eps_krw), "bps": str(bps_krw),
-                }
+            diff_usd = last - base
+            if base > 0:
+                change_rate = f"{((diff_usd / base) * 100):.2f}"
+            else:
+                change_rate = "0.00"
+
+            price_krw = int(last * rate)
+            diff_krw = int(diff_usd * rate)
+            amount_krw = int(amount * rate)
+            market_cap_krw_eok = (tomv * rate)
+            eps_krw = int(eps_usd * rate)
+            bps_krw = int(bps_usd * rate)
+
+            result = {
+                "market": "overseas",
+                "market_name": "NAS",
+                "code": code,
+                "price": str(price_krw), # 주식 현재가
+                "diff": str(diff_krw), # 전일 대비
+                "rate": str(change_rate), # 전일 대비율
+                "amount": str(amount_krw), # 거래 대금
+                "volume": data.get("tvol"), # 거래량
+                "shares_outstanding": data.get("shar"), # 상장 주수
+                "market_cap": str(int(market_cap_krw_eok)), # 시가총액
+                "per": data.get("perx"), "pbr": data.get("pbrx"), "eps": str(eps_krw), "bps": str(bps_krw),
+            }
+            quote_cache.set("overseas", code, result)
+            return result
         
         except Exception as e:
             logger.error(f"⛔ Failed to fetch overseas stock: {e}")
             return None
         
+    async def get_quotes(self, symbols: List[Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """
+        여러 종목의 현재가를 한 번에 조회합니다.
+        :param symbols: [{"market": "KOSPI" | "KOSDAQ" | "domestic" | "NAS" | "overseas" ..., "code": "005930"}, ...]
+        :return: {종목코드: 시세} (조회에 실패한 종목은 제외)
+        """
+        # 1. 중복 제거 + 시장 구분
+        domestic_codes = []
+        overseas_codes = {} # code -> exchange
+        for symbol in symbols:
+            code = symbol.get("code")
+            if not code:
+                continue
+            market = symbol.get("market") or "domestic"
+            if market.lower() in DOMESTIC_MARKETS:
+                if code not in domestic_codes:
+                    domestic_codes.append(code)
+            elif code not in overseas_codes:
+                exchange = symbol.get("exchange") or market.upper()
+                overseas_codes[code] = exchange if exchange in OVERSEAS_EXCHANGES else "NAS"
+
+        results: Dict[str, Dict[str, Any]] = {}
+
+        # 2. 캐시에 있는 종목은 바로 사용
+        domestic_misses = []
+        for code in domestic_codes:
+            cached = quote_cache.get("domestic", code)
+            if cached:
+                results[code] = cached
+            else:
+                domestic_misses.append(code)
+
+        # 3. 국내: 멀티종목 시세조회로 최대 30종목씩 묶어서 조회
+        chunks = [domestic_misses[i:i + MULTI_PRICE_MAX_SYMBOLS] for i in range(0, len(domestic_misses), MULTI_PRICE_MAX_SYMBOLS)]
+        for batch in await asyncio.gather(*[self._get_domestic_multi(chunk) for chunk in chunks]):
+            results.update(batch)
+
+        # 4. 묶음 조회에서 빠진 국내 종목과 해외 종목은 동시 호출 수를 제한하여 개별 조회
+        semaphore = asyncio.Semaphore(QUOTE_CONCURRENCY)
+
+        async def fetch_one(code: str, exchange: Optional[str]):
+            async with semaphore:
+                if exchange is None:
+                    return code, await self._get_domestic_stock(code)
+                return code, await self._get_overseas_stock(code, exchange)
+
+        tasks = [fetch_one(code, None) for code in domestic_misses if code not in results]
+        tasks += [fetch_one(code, exchange) for code, exchange in overseas_codes.items()]
+        for code, quote in await asyncio.gather(*tasks):
+            if quote:
+                results[code] = quote
+
+        return results
+
+    async def _get_domestic_multi(self, codes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        국내 주식 관심종목(멀티종목) 시세조회 (최대 30종목)
+        상세 지표(PER, 시가총액 등)는 포함되지 않으므로 현재가 캐시에는 저장하지 않음
+        """
+        if not codes:
+            return {}
+
+        tr_id = "FHKST11300006"
+        url = f"{self.base_url}/uapi/domestic-stock/v1/quotations/intstock-multprice"
+
+        headers = await self._get_headers(tr_id)
+        params = {}
+        for idx, code in enumerate(codes, start=1):
+            params[f"FID_COND_MRKT_DIV_CODE_{idx}"] = "J"
+            params[f"FID_INPUT_ISCD_{idx}"] = code
+
+        try:
+            response = await kis_client.get(url, headers=headers, params=params)
+            response.raise_for_status()
+            res_json = response.json()
+
+            if res_json["rt_cd"] != "0":
+                logger.error(f"⛔ Multi Price API Error: {res_json['msg1']}")
+                return {}
+
+            results = {}
+            for data in res_json.get("output", []):
+                code = data.get("inter_shrn_iscd")
+                if not code:
+                    continue
+                results[code] = {
+                    "market": "domestic",
+                    "code": code,
+                    "name": data.get("inter_kor_isnm"),
+                    "price": data.get("inter2_prpr"), # 현재가
+                    "diff": data.get("inter2_prdy_vrss"), # 전일 대비
+                    "rate": data.get("prdy_ctrt"), # 전일 대비율
+                    "amount": data.get("acml_tr_pbmn"), # 누적 거래 대금
+                    "volume": data.get("acml_vol"), # 누적 거래량
+                }
+            return results
+
+        except Exception as e:
+            logger.error(f"⛔ Failed to fetch domestic multi price: {e}")
+            return {}
+
     async def get_domestic_stock_time_conclusion(self, code: str, start_time: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
         """
         국내 주식의 당일 시간대별 체결 내역을 조회합니다.
@@ -173,17 +329,16 @@ class StockInfoService:
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=headers, params=params)
-                response.raise_for_status()
-                res_json = response.json()
-
-                if res_json["rt_cd"] != "0":
-                    logger.error(f"⛔ Time Conclusion API Error: {res_json['msg1']}")
-                    return None
+            response = await kis_client.get(url, headers=headers, params=params)
+            response.raise_for_status()
+            res_json = response.json()
+
+            if res_json["rt_cd"] != "0":
+                logger.error(f"⛔ Time Conclusion API Error: {res_json['msg1']}")
+                return None
                 
-                # output2: 체결 내역 리스트 (output1은 현재가 상세 정보)
-                return res_json["output2"]
+            # output2: 체결 내역 리스트 (output1은 현재가 상세 정보)
+            return res_json["output2"]
 
         except Exception as e:
             logger.error(f"⛔ Failed to fetch domestic stock time conclusion: {e}")
@@ -210,17 +365,16 @@ class StockInfoService:
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=headers, params=params)
-                response.raise_for_status()
-                res_json = response.json()
-
-                if res_json["rt_cd"] != "0":
-                    logger.error(f"⛔ Overseas Conclusion API Error: {res_json['msg1']}")
-                    return None
+            response = await kis_client.get(url, headers=headers, params=params)
+            response.raise_for_status()
+            res_json = response.json()
+
+            if res_json["rt_cd"] != "0":
+                logger.error(f"⛔ Overseas Conclusion API Error: {res_json['msg1']}")
+                return None
                 
-                # output1: 체결추이 리스트
-                return res_json["output1"]
+            # output1: 체결추이 리스트
+            return res_json["output1"]
 
         except Exception as e:
             logger.error(f"⛔ Failed to fetch overseas stock conclusion: {e}")
@@ -0,0 +1,166 @@
+import logging
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import settings
+from services.kis.ws_parser import Tick
+
+logger = logging.getLogger(__name__)
+
+class TickRingBuffer:
+    """
+    종목 1개의 최근 체결 내역 (고정 크기 원형 버퍼, NumPy 배열)
+    시간(HHMMSS) / 체결가 / 전일 대비 / 등락률 / 체결량
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.int32)
+        self.prices = np.zeros(capacity, dtype=np.float64)
+        self.diffs = np.zeros(capacity, dtype=np.float64)
+        self.rates = np.zeros(capacity, dtype=np.float64)
+        self.volumes = np.zeros(capacity, dtype=np.int64)
+
+        self.head = 0 # 다음에 쓸 위치
+        self.size = 0
+        self.seeded = False # REST 체결 내역으로 과거 구간을 채웠는지 여부
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, time: int, price: float, diff: float, rate: float, volume: int):
+        i = self.head
+        self.times[i] = time
+        self.prices[i] = price
+        self.diffs[i] = diff
+        self.rates[i] = rate
+        self.volumes[i] = volume
+        self.head = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def _indices(self, n: int) -> np.ndarray:
+        """최근 n건의 위치 (최신순)"""
+        n = min(n, self.size)
+        return (self.head - 1 - np.arange(n)) % self.capacity
+
+    def last(self, n: int) -> List[Dict[str, Any]]:
+        """최근 n건 (최신순, REST 체결 내역과 같은 순서)"""
+        idx = self._indices(n)
+        times = self.times[idx].tolist()
+        prices = self.prices[idx].tolist()
+        diffs = self.diffs[idx].tolist()
+        rates = self.rates[idx].tolist()
+        volumes = self.volumes[idx].tolist()
+        return [
+            {
+                "time": f"{t:06d}",
+                "price": _format(p),
+                "diff": _format(d),
+                "rate": f"{r:.2f}",
+                "volume": str(v),
+            }
+            for t, p, d, r, v in zip(times, prices, diffs, rates, volumes)
+        ]
+
+    def seed(self, rows: List[Tuple[int, float, float, float, int]]):
+        """
+        REST로 조회한 과거 체결 내역(오래된 순)을 버퍼 앞쪽에 채움
+        이미 들어온 실시간 체결보다 이전 시각의 내역만 사용
+        """
+        live = self._indices(self.size)[::-1] # 오래된 순
+        live_rows = list(zip(
+            self.times[live].tolist(), self.prices[live].tolist(), self.diffs[live].tolist(),
+            self.rates[live].tolist(), self.volumes[live].tolist(),
+        ))
+        first_live_time = live_rows[0][0] if live_rows else None
+        if first_live_time is not None:
+            rows = [row for row in rows if row[0] < first_live_time]
+
+        self.head = 0
+        self.size = 0
+        for row in (rows + live_rows)[-self.capacity:]:
+            self.append(*row)
+        self.seeded = True
+
+def _format(value: float) -> str:
+    return str(int(value)) if value == int(value) else f"{value:.4f}".rstrip("0")
+
+def _to_row(time, price, diff, rate, volume) -> Optional[Tuple[int, float, float, float, int]]:
+    try:
+        return int(time), float(price), float(diff), float(rate), int(float(volume or 0))
+    except (TypeError, ValueError):
+        return None
+
+class TickStore:
+    """
+    실시간 체결(웹소켓)로 채워지는 종목별 최근 체결 내역
+    - 업스트림에 구독 중인 종목만 버퍼를 가짐 (구독 해제 시 제거)
+    - 종목 상세의 체결 내역(history)을 REST 호출 없이 메모리에서 제공
+    """
+    def __init__(self, capacity: int, max_symbols: int):
+        self.capacity = capacity
+        self.max_symbols = max_symbols
+        self.buffers: "OrderedDict[Tuple[str, str], TickRingBuffer]" = OrderedDict()
+
+        self.ticks = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, market: str, code: str) -> Tuple[str, str]:
+        return market, code.upper()
+
+    def append_tick(self, market: str, tick: Tick):
+        """웹소켓 체결 1건 추가 (market: 'domestic' / 'overseas')"""
+        row = _to_row(tick.time, tick.price, tick.diff, tick.rate, tick.vol)
+        if row is None:
+            return
+
+        key = self._key(market, tick.code)
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = self.buffers[key] = TickRingBuffer(self.capacity)
+            while len(self.buffers) > self.max_symbols:
+                self.buffers.popitem(last=False)
+        else:
+            self.buffers.move_to_end(key)
+
+        buffer.append(*row)
+        self.ticks += 1
+
+    def remove(self, market: str, code: str):
+        self.buffers.pop(self._key(market, code), None)
+
+    def get_history(self, market: str, code: str, n: int) -> Optional[List[Dict[str, Any]]]:
+        """실시간으로 갱신 중이고 과거 구간이 채워진 종목이면 최근 n건 반환, 아니면 None"""
+        buffer = self.buffers.get(self._key(market, code))
+        if buffer is None or not buffer.seeded:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return buffer.last(n)
+
+    def seed(self, market: str, code: str, history: List[Dict[str, Any]]):
+        """
+        REST 체결 내역(최신순, {time, price, diff, rate, volume})으로 과거 구간 채우기
+        실시간 체결이 들어오고 있는 종목만 대상
+        """
+        buffer = self.buffers.get(self._key(market, code))
+        if buffer is None or buffer.seeded:
+            return
+        rows = [_to_row(h.get("time"), h.get("price"), h.get("diff"), h.get("rate"), h.get("volume")) for h in reversed(history)]
+        buffer.seed([row for row in rows if row is not None])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "symbols": len(self.buffers),
+            "seeded": sum(1 for buffer in self.buffers.values() if buffer.seeded),
+            "capacity_per_symbol": self.capacity,
+            "ticks": self.ticks,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+tick_store = TickStore(
+    capacity=settings.TICK_BUFFER_SIZE,
+    max_symbols=settings.TICK_STORE_MAX_SYMBOLS,
+)
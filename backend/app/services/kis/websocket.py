@@ -1,133 +1,208 @@
 import asyncio
 import json
+import random
 import logging
 import websockets
-import httpx
+from concurrent.futures import ThreadPoolExecutor
 from core.config import settings
 from services.kis.auth import kis_auth
+from services.kis.exchange_rate import exchange_rate_service
+from services.kis.quote_cache import quote_cache
+from services.kis.tick_store import tick_store
+from services.kis.candle_store import candle_store
+from services.kis.relay import RealtimeMessage
+from services.kis.ws_parser import Tick, is_data_frame, is_encrypted_frame, decrypt_frame, parse_frame
 
 logger = logging.getLogger(__name__)
 
-class KisWebSocketManager:
-    def __init__(self):
+def reconnect_delay(attempt: int) -> float:
+    """재연결 대기 시간: 지수 백오프 + jitter"""
+    ceiling = min(settings.KIS_WS_RECONNECT_MAX, settings.KIS_WS_RECONNECT_BASE * (2 ** attempt))
+    return random.uniform(ceiling / 2, ceiling)
+
+class KisWebSocketSession:
+    """
+    KIS 실시간 웹소켓 세션 1개 (샤드)
+    KIS는 세션(approval key)당 등록 가능한 실시간 종목 수가 제한되어 있어, 여러 세션에 구독을 나누어 등록
+    연결이 끊기면 감시 task(_supervise)가 백오프 후 재연결하고 등록되어 있던 종목을 다시 구독
+    """
+    def __init__(self, shard_id: int, manager, app_key: str, secret_key: str, capacity: int):
+        self.shard_id = shard_id
+        self.manager = manager
+        self.app_key = app_key
+        self.secret_key = secret_key
+        self.capacity = capacity
+
         self.url = settings.KIS_WS_URL
-        self.approval_key = kis_auth.approval_key 
+        self.approval_key = None
         self.websocket = None
-        self.subscribed = []  # 현재 구독 중인 종목 목록
-        
-        self.clients = set()
-        self.running_task = None
-        self.exchange_rate = 1430.0
-
-    async def update_exchange_rate(self):
+        self.subscribed = set()  # 이 세션에 배치된 (tr_id, tr_key). 재연결 시 다시 구독
+        self.ciphers = {}  # 암호화 TR의 복호화 키: TR ID → (key, iv). 구독 응답으로 받음
+        self.supervisor = None
+        self._connect_lock = asyncio.Lock()
+
+        self.messages = 0
+        self.disconnects = 0
+        self.reconnects = 0
+
+    @property
+    def load(self) -> int:
+        return len(self.subscribed)
+
+    @property
+    def is_full(self) -> bool:
+        return self.load >= self.capacity
+
+    @property
+    def is_connected(self) -> bool:
+        return self.websocket is not None
+
+    @property
+    def is_reconnecting(self) -> bool:
+        return self.websocket is None and self.supervisor is not None and not self.supervisor.done()
+
+    async def _get_approval_key(self):
+        if self.app_key == settings.KIS_APP_KEY:
+            return await kis_auth.get_approval_key()
+        return await kis_auth.get_extra_approval_key(self.app_key, self.secret_key)
+
+    async def _open(self) -> bool:
+        logger.info(f"Connecting to KIS WebSocket... (shard {self.shard_id})")
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get("https://open.er-api.com/v6/latest/USD")
-                data = response.json()
-                self.exchange_rate = data['rates']['KRW']
-                logger.info(f"💱 Updated Exchange Rate: {self.exchange_rate} KRW/USD")
+            # 만료가 임박한 approval key는 연결 전에 갱신
+            self.approval_key = await self._get_approval_key()
+            self.websocket = await websockets.connect(
+                self.url,
+                ping_interval=20,
+                ping_timeout=20
+            )
+            logger.info(f"✅ KIS WebSocket Connected (shard {self.shard_id})")
         except Exception as e:
-            logger.error(f"Failed to fetch exchange rate: {e}")
-
-    async def connect(self):
-        if self.websocket is None:
-            logger.info("Connecting to KIS WebSocket...")
-            try:
-                self.websocket = await websockets.connect(
-                    self.url,
-                    ping_interval=20,
-                    ping_timeout=20
-                )
-                logger.info("✅ KIS WebSocket Connected")
-                
-                if not self.running_task or self.running_task.done():
-                    self.running_task = asyncio.create_task(self.read_loop())
-            except Exception as e:
-                logger.error(f"KIS WebSocket connection failed: {e}")
-                self.websocket = None
+            logger.error(f"KIS WebSocket connection failed (shard {self.shard_id}): {e}")
+            self.websocket = None
+        return self.websocket is not None
+
+    async def connect(self) -> bool:
+        """연결되어 있지 않으면 연결하고 감시 task 시작 (재연결 중인 세션은 False)"""
+        async with self._connect_lock:
+            if self.websocket is not None:
+                return True
+            if self.is_reconnecting:
+                return False
+            if not await self._open():
+                return False
+            self.supervisor = asyncio.create_task(self._supervise())
+            return True
 
     async def close(self):
+        task, self.supervisor = self.supervisor, None
+        if task:
+            task.cancel()
         if self.websocket:
             await self.websocket.close()
             self.websocket = None
-            self.subscribed = []
-            if self.running_task:
-                self.running_task.cancel()
-
-    # [수정됨] 구독 목록을 "교체"하지 않고 "추가"하도록 변경
-    async def subscribe_items(self, items):
-        await self.connect()
-        # await self.update_exchange_rate() # 너무 빈번한 호출 방지를 위해 필요시 주석 처리 혹은 캐싱 권장
+        self.subscribed = set()
 
-        if not self.approval_key:
-            self.approval_key = await kis_auth.get_approval_key()
-
-        # 현재 이미 구독 중인 키들의 집합
-        current_keys = set((i['tr_id'], i['tr_key']) for i in self.subscribed)
-        
-        # 요청 들어온 것들 중, 아직 구독하지 않은 것만 골라냄 (중복 구독 방지)
-        to_subscribe = [i for i in items if (i['tr_id'], i['tr_key']) not in current_keys]
-
-        # [삭제됨] to_unsubscribe 로직 제거 
-        # (검색어 입력 시 상세페이지의 구독이 끊기는 문제 해결)
+    async def _supervise(self):
+        """연결 유지: 수신 루프 → 끊기면 재연결(백오프) → 구독 복구 반복"""
+        while True:
+            try:
+                await self.read_loop()
+            finally:
+                # 어떤 이유로 수신 루프가 끝나도 끊긴 소켓을 연결된 상태로 남기지 않음
+                self.websocket = None
+            self.disconnects += 1
+
+            # 보고 있는 종목이 없으면 재연결하지 않음
+            if not self.subscribed:
+                return
+
+            logger.warning(f"⚠️ KIS WebSocket 연결 끊김 (shard {self.shard_id}), {len(self.subscribed)}개 종목 재연결 대기")
+            self.manager.notify_status(list(self.subscribed), "reconnecting")
+            if not await self._reconnect():
+                return
+
+    async def _reconnect(self) -> bool:
+        """백오프 후 재연결하고 구독 복구. 복구 도중 다시 끊기면 재연결부터 반복 (보고 있는 종목이 없어지면 False)"""
+        attempt = 0
+        while True:
+            await asyncio.sleep(reconnect_delay(attempt))
+            attempt += 1
+            if not self.subscribed:
+                return False
+            try:
+                if not await self._open():
+                    # 재연결이 바로 되지 않으면 여유가 있는 다른 세션으로 옮길 수 있는 종목은 옮김
+                    if attempt == 1:
+                        await self.manager.rebalance(self)
+                    continue
+
+                self.reconnects += 1
+                for route_key in list(self.subscribed):
+                    await self.send_request("1", route_key)
+                logger.info(f"✅ KIS WebSocket 재연결 완료 (shard {self.shard_id}), {len(self.subscribed)}개 종목 재구독")
+                # 재연결 중에 요청되어 어느 세션에도 등록하지 못한 종목도 함께 등록
+                placed = await self.manager.place_unplaced()
+                self.manager.notify_status(list(dict.fromkeys([*self.subscribed, *placed])), "connected")
+                return True
+            except websockets.exceptions.ConnectionClosed:
+                logger.warning(f"⚠️ KIS WebSocket 구독 복구 중 연결 끊김 (shard {self.shard_id}), 재연결 재시도")
+                self.websocket = None
 
-        # 신규 종목 구독 요청 전송
-        for item in to_subscribe:
-            req = {
-                "header": {
-                    "approval_key": self.approval_key,
-                    "custtype": "P",
-                    "tr_type": "1",
-                    "content-type": "utf-8"
-                },
-                "body": {
-                    "input": {
-                        "tr_id": item["tr_id"],
-                        "tr_key": item["tr_key"]
-                    }
+    async def send_request(self, tr_type: str, route_key):
+        """tr_type: "1" 등록 / "2" 해제"""
+        tr_id, tr_key = route_key
+        req = {
+            "header": {
+                "approval_key": self.approval_key,
+                "custtype": "P",
+                "tr_type": tr_type,
+                "content-type": "utf-8"
+            },
+            "body": {
+                "input": {
+                    "tr_id": tr_id,
+                    "tr_key": tr_key
                 }
             }
-            if self.websocket:
-                await self.websocket.send(json.dumps(req))
-            
-            # [추가] 메모리 상의 리스트에도 추가
-            self.subscribed.append(item)
-
-        if to_subscribe:
-            logger.info(f"🔔 Added subscriptions: {len(to_subscribe)} items. Total: {len(self.subscribed)}")
-
-    async def unsubscribe_all(self):
-        if not self.websocket:
-            return
+        }
+        if self.websocket:
+            await self.websocket.send(json.dumps(req))
 
-        if not self.approval_key:
-            self.approval_key = await kis_auth.get_approval_key()
-
-        for item in self.subscribed:
-            req = {
-                "header": {
-                    "approval_key": self.approval_key,
-                    "custtype": "P",
-                    "tr_type": "2",
-                    "content-type": "utf-8"
-                },
-                "body": {
-                    "input": {
-                        "tr_id": item["tr_id"],
-                        "tr_key": item["tr_key"]
-                    }
-                }
-            }
-            if self.websocket:
-                await self.websocket.send(json.dumps(req))
+    async def subscribe(self, route_key):
+        self.subscribed.add(route_key)
+        await self.send_request("1", route_key)
 
-        self.subscribed = []
+    async def unsubscribe(self, route_key):
+        self.subscribed.discard(route_key)
+        await self.send_request("2", route_key)
 
-    def usd_to_krw(self, val):
+    async def _handle_control(self, msg):
+        """JSON 제어 메시지 처리. PINGPONG은 그대로 돌려주어야 KIS가 연결을 유지"""
         try:
-            return str(int(float(val) * self.exchange_rate))
-        except:
-            return "0"
+            data = json.loads(msg)
+        except json.JSONDecodeError:
+            return
+        tr_id = (data.get("header") or {}).get("tr_id")
+        if tr_id == "PINGPONG":
+            await self.websocket.pong(msg)
+            return
+
+        # 구독 응답: 암호화 TR(체결 통보 등)이면 복호화용 key / iv가 함께 옴
+        output = (data.get("body") or {}).get("output") or {}
+        if output.get("key") and output.get("iv"):
+            self.ciphers[tr_id] = (output["key"], output["iv"])
+
+    async def _decrypt(self, msg):
+        # 일반 크기 프레임은 바로 복호화 (스레드 전환 비용이 복호화보다 큼)
+        # 아주 큰 프레임만 스레드 풀에서 수행하여 이벤트 루프를 오래 막지 않음
+        if len(msg) <= settings.KIS_WS_DECRYPT_INLINE_BYTES:
+            plain = decrypt_frame(msg, self.ciphers)
+        else:
+            loop = asyncio.get_running_loop()
+            plain = await loop.run_in_executor(self.manager.decrypt_executor, decrypt_frame, msg, self.ciphers)
+        if plain is not None:
+            await self.manager.handle_message(plain)
 
     async def read_loop(self):
         try:
@@ -137,215 +212,318 @@ class KisWebSocketManager:
                 
                 try:
                     msg = await self.websocket.recv()
-                    
-                    data = None
-                    try:
-                        data = json.loads(msg)
-                    except json.JSONDecodeError:
-                        pass 
-                    
-                    if data and "iv" in data and "body" in data:
-                        pass
-                    elif data and "header" in data:
-                        pass 
+                    self.messages += 1
+                    if isinstance(msg, str) and msg[:1] == "{":
+                        await self._handle_control(msg)
+                    elif is_encrypted_frame(msg):
+                        await self._decrypt(msg)
                     else:
-                        if isinstance(msg, str) and '|' in msg:
-                            parts = msg.split('|')
-                            if len(parts) >= 4:
-                                tr_id = parts[1]
-                                raw_data = parts[3]
-                                values = raw_data.split('^')
-                                
-                                parsed = None
-
-                                if tr_id == "H0STCNT0" and len(values) > 10:
-                                    parsed = {
-                                        "type": "tick",
-                                        "code": values[0],
-                                        "time": values[1],
-                                        "price": values[2], 
-                                        "rate": values[5],
-                                        "volume": values[13],
-                                        "amount": values[14],
-                                        "vol": values[12],
-                                        "date": values[33],
-                                        "open": values[7],
-                                        "high": values[8],
-                                        "low": values[9],
-                                        "diff": values[4],
-                                        "strength": values[18]
-                                    }
-
-                                elif tr_id == "H0STASP0" and len(values) > 10:
-                                    parsed = {
-                                        "type": "ask",
-                                        "code": values[0],
-                                        "time": values[1],
-                                        # 매도호가 1~10
-                                        "ask_price_1": values[3],
-                                        "ask_price_2": values[4],
-                                        "ask_price_3": values[5],
-                                        "ask_price_4": values[6],
-                                        "ask_price_5": values[7],
-                                        "ask_price_6": values[8],
-                                        "ask_price_7": values[9],
-                                        "ask_price_8": values[10],
-                                        "ask_price_9": values[11],
-                                        "ask_price_10": values[12],
-
-                                        # 매수호가 1~10
-                                        "bid_price_1": values[13],
-                                        "bid_price_2": values[14],
-                                        "bid_price_3": values[15],
-                                        "bid_price_4": values[16],
-                                        "bid_price_5": values[17],
-                                        "bid_price_6": values[18],
-                                        "bid_price_7": values[19],
-                                        "bid_price_8": values[20],
-                                        "bid_price_9": values[21],
-                                        "bid_price_10": values[22],
-
-                                        # 매도 잔량 ASKP_RSQN1~10
-                                        "ask_remain_1": values[23],
-                                        "ask_remain_2": values[24],
-                                        "ask_remain_3": values[25],
-                                        "ask_remain_4": values[26],
-                                        "ask_remain_5": values[27],
-                                        "ask_remain_6": values[28],
-                                        "ask_remain_7": values[29],
-                                        "ask_remain_8": values[30],
-                                        "ask_remain_9": values[31],
-                                        "ask_remain_10": values[32],
-
-                                        # 매수 잔량 BIDP_RSQN1~10
-                                        "bid_remain_1": values[33],
-                                        "bid_remain_2": values[34],
-                                        "bid_remain_3": values[35],
-                                        "bid_remain_4": values[36],
-                                        "bid_remain_5": values[37],
-                                        "bid_remain_6": values[38],
-                                        "bid_remain_7": values[39],
-                                        "bid_remain_8": values[40],
-                                        "bid_remain_9": values[41],
-                                        "bid_remain_10": values[42],
-                                    }
-                                
-                                elif tr_id == "HDFSCNT0" and len(values) > 21:
-                                    try:
-                                        price_usd = float(values[11])
-                                        price_krw = price_usd * self.exchange_rate
-                                        amount_usd = float(values[21])
-                                        amount_krw = amount_usd * self.exchange_rate
-                                        diff_usd = float(values[13])
-                                        diff_krw = diff_usd * self.exchange_rate
-                                        open_usd = float(values[8])
-                                        open_krw = open_usd * self.exchange_rate
-                                        high_usd = float(values[9])
-                                        high_krw = high_usd * self.exchange_rate
-                                        low_usd = float(values[10])
-                                        low_krw = low_usd * self.exchange_rate
-                                        
-                                        parsed = {
-                                            "type": "tick",
-                                            "code": values[1],
-                                            "time": values[7],
-                                            "price": str(int(price_krw)),
-                                            "rate": values[14],
-                                            "volume": values[20],
-                                            "amount": str(int(amount_krw)),
-                                            "vol": values[19],
-                                            "date": values[6],
-                                            "open": str(int(open_krw)),
-                                            "high": str(int(high_krw)),
-                                            "low": str(int(low_krw)),
-                                            "diff": str(int(diff_krw)),
-                                            "strength": values[24]
-                                        }
-                                    except ValueError:
-                                        pass
-                                
-                                elif tr_id == "HDFSASP0" and len(values) > 66:
-                                    parsed = {
-                                        "type": "ask",
-                                        "code": values[1],   # SYMB (AAPL, TSLA 등)
-                                        "time": values[6],   # KHMS (한국시간 HHMMSS)
-
-                                         # 매수호가 PBIDx (USD → KRW)
-                                        "bid_price_1": self.usd_to_krw(values[11]),
-                                        "bid_price_2": self.usd_to_krw(values[17]),
-                                        "bid_price_3": self.usd_to_krw(values[23]),
-                                        "bid_price_4": self.usd_to_krw(values[29]),
-                                        "bid_price_5": self.usd_to_krw(values[35]),
-                                        "bid_price_6": self.usd_to_krw(values[41]),
-                                        "bid_price_7": self.usd_to_krw(values[47]),
-                                        "bid_price_8": self.usd_to_krw(values[53]),
-                                        "bid_price_9": self.usd_to_krw(values[59]),
-                                        "bid_price_10": self.usd_to_krw(values[65]),
-
-                                        # 매도호가 PASKx (USD → KRW)
-                                        "ask_price_1": self.usd_to_krw(values[12]),
-                                        "ask_price_2": self.usd_to_krw(values[18]),
-                                        "ask_price_3": self.usd_to_krw(values[24]),
-                                        "ask_price_4": self.usd_to_krw(values[30]),
-                                        "ask_price_5": self.usd_to_krw(values[36]),
-                                        "ask_price_6": self.usd_to_krw(values[42]),
-                                        "ask_price_7": self.usd_to_krw(values[48]),
-                                        "ask_price_8": self.usd_to_krw(values[54]),
-                                        "ask_price_9": self.usd_to_krw(values[60]),
-                                        "ask_price_10": self.usd_to_krw(values[66]),
-
-                                        # 매수 잔량 VBID1~10
-                                        "bid_remain_1": values[13],
-                                        "bid_remain_2": values[19],
-                                        "bid_remain_3": values[25],
-                                        "bid_remain_4": values[31],
-                                        "bid_remain_5": values[37],
-                                        "bid_remain_6": values[43],
-                                        "bid_remain_7": values[49],
-                                        "bid_remain_8": values[55],
-                                        "bid_remain_9": values[61],
-                                        "bid_remain_10": values[67],
-
-                                        # 매도 잔량 VASK1~10
-                                        "ask_remain_1": values[14],
-                                        "ask_remain_2": values[20],
-                                        "ask_remain_3": values[26],
-                                        "ask_remain_4": values[32],
-                                        "ask_remain_5": values[38],
-                                        "ask_remain_6": values[44],
-                                        "ask_remain_7": values[50],
-                                        "ask_remain_8": values[56],
-                                        "ask_remain_9": values[62],
-                                        "ask_remain_10": values[68],
-                                    }
-
-                                if parsed:
-                                    await self.broadcast(parsed)
+                        await self.manager.handle_message(msg)
 
                 except websockets.exceptions.ConnectionClosed:
                     break
                 except Exception:
                     pass
 
+        except asyncio.CancelledError:
+            raise
         except Exception:
             pass
+
+    def get_stats(self):
+        return {
+            "shard": self.shard_id,
+            "connected": self.is_connected,
+            "reconnecting": self.is_reconnecting,
+            "subscriptions": self.load,
+            "capacity": self.capacity,
+            "messages": self.messages,
+            "disconnects": self.disconnects,
+            "reconnects": self.reconnects,
+        }
+
+class KisWebSocketManager:
+    """
+    KIS 실시간 웹소켓 세션 풀
+    - 구독은 (tr_id, tr_key) 단위로 세션(샤드)에 배치: 연결된 세션 중 여유가 있고 가장 적게 사용 중인 세션 우선,
+      모두 가득 찬 경우에만 새 세션 연결
+    - 세션이 끊기면 재연결 후 재구독하고, 그 사이 여유가 있는 다른 세션으로 옮길 수 있는 종목은 재배치
+    """
+    def __init__(self):
+        capacity = settings.KIS_WS_MAX_SUBSCRIPTIONS
+        app_keys = [{"app_key": settings.KIS_APP_KEY, "secret_key": settings.KIS_SECRET_KEY}]
+        app_keys += settings.KIS_WS_EXTRA_APP_KEYS
+        self.sessions = [
+            KisWebSocketSession(shard_id, self, keys["app_key"], keys["secret_key"], capacity)
+            for shard_id, keys in enumerate(app_keys)
+        ]
+        self.placements = {}  # (tr_id, tr_key) → 등록된 세션
         
-        finally:
-            self.websocket = None
-            self.running_task = None
-            self.subscribed = []
+        # (tr_id, tr_key) → 해당 종목을 구독한 클라이언트 콜백 집합
+        # 체결/호가 데이터는 관심 있는 클라이언트에게만 전달 (전체 브로드캐스트 X)
+        # 콜백 수가 곧 참조 카운트: 0이 되면 linger 후 KIS 구독 해제
+        self.routes = {}
+        self.pending_unsubscribes = {}  # (tr_id, tr_key) → 구독 해제 대기 task
+        self.placement_task = None  # 등록하지 못한 종목 재시도 task (백오프)
+        self.status_hooks = {}  # 데이터 수신 콜백 → 연결 상태 메시지 전송 함수
+        self.decrypt_executor = ThreadPoolExecutor(
+            max_workers=settings.KIS_WS_DECRYPT_WORKERS,
+            thread_name_prefix="kis-ws-decrypt",
+        )
+        self.unsubscribe_linger = settings.KIS_WS_UNSUBSCRIBE_LINGER
+
+    @property
+    def exchange_rate(self) -> float:
+        return exchange_rate_service.get_rate()
+
+    async def close(self):
+        task, self.placement_task = self.placement_task, None
+        if task:
+            task.cancel()
+        for session in self.sessions:
+            await session.close()
+        self.placements = {}
+        self.decrypt_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _place(self, route_key) -> bool:
+        """여유가 있는 세션에 종목 등록 (연결된 세션 → 적게 사용 중인 세션 순)"""
+        candidates = sorted(
+            (session for session in self.sessions if not session.is_full),
+            key=lambda session: (not session.is_connected, session.load),
+        )
+        for session in candidates:
+            if await session.connect():
+                self.placements[route_key] = session
+                try:
+                    await session.subscribe(route_key)
+                except websockets.exceptions.ConnectionClosed:
+                    # 등록 요청 중 끊긴 세션은 감시 task가 재연결 후 subscribed 목록으로 다시 구독
+                    pass
+                return True
+
+        logger.warning(f"⚠️ 등록 가능한 KIS 웹소켓 세션이 없습니다: {route_key[1]}")
+        return False
+
+    async def place_unplaced(self) -> list:
+        """구독자는 있지만 세션에 등록하지 못한 종목(모든 세션이 가득 차거나 재연결 중이던 경우) 등록. 등록한 종목 반환"""
+        placed = []
+        for route_key in [k for k in self.routes if k not in self.placements]:
+            if not await self._place(route_key):
+                break
+            placed.append(route_key)
+        if placed:
+            logger.info(f"🔔 대기 중이던 {len(placed)}개 종목 등록. Total: {len(self.placements)}")
+        return placed
+
+    def _has_unplaced(self) -> bool:
+        return any(route_key not in self.placements for route_key in self.routes)
+
+    def _schedule_placement(self):
+        """등록하지 못한 종목이 있으면 재시도 task 시작 (첫 연결 실패, 모든 세션이 가득 찬 경우 등)"""
+        if self._has_unplaced() and (self.placement_task is None or self.placement_task.done()):
+            self.placement_task = asyncio.create_task(self._retry_placement())
+
+    async def _retry_placement(self):
+        """등록하지 못한 종목이 남아 있는 동안 백오프하며 등록 재시도"""
+        attempt = 0
+        while self._has_unplaced():
+            await asyncio.sleep(reconnect_delay(attempt))
+            attempt += 1
+            try:
+                placed = await self.place_unplaced()
+            except Exception as e:
+                logger.warning(f"⚠️ 대기 중인 종목 등록 실패: {e}")
+                continue
+            if placed:
+                attempt = 0
+                self.notify_status(placed, "connected")
 
-    def add_client(self, callback):
-        self.clients.add(callback)
+    # [수정됨] 구독 목록을 "교체"하지 않고 "추가"하도록 변경
+    async def subscribe_items(self, items, callback):
+        """callback이 해당 종목 데이터를 받도록 등록하고, KIS에 아직 등록되지 않은 종목만 구독 요청"""
+        route_keys = [(i["tr_id"], i["tr_key"]) for i in items]
+        for route_key in route_keys:
+            self.routes.setdefault(route_key, set()).add(callback)
+            # 해제 대기 중이던 종목을 다시 구독하면 해제 취소
+            pending = self.pending_unsubscribes.pop(route_key, None)
+            if pending:
+                pending.cancel()
+
+        # 요청 들어온 것들 중, 아직 구독하지 않은 것만 골라냄 (중복 구독 방지)
+        to_subscribe = [k for k in dict.fromkeys(route_keys) if k not in self.placements]
+
+        # 신규 종목 구독 요청 전송
+        placed = 0
+        for route_key in to_subscribe:
+            if await self._place(route_key):
+                placed += 1
+
+        if placed:
+            logger.info(f"🔔 Added subscriptions: {placed} items. Total: {len(self.placements)}")
+        if placed < len(to_subscribe):
+            self._schedule_placement()
+
+    def unsubscribe_items(self, items, callback):
+        """callback의 종목 구독 해제 (다른 클라이언트가 보고 있는 종목은 유지)"""
+        for item in items:
+            self._release((item["tr_id"], item["tr_key"]), callback)
 
     def remove_client(self, callback):
-        self.clients.discard(callback)
+        """클라이언트 연결 종료 시 모든 종목 구독에서 콜백 제거"""
+        self.status_hooks.pop(callback, None)
+        for route_key in list(self.routes):
+            self._release(route_key, callback)
+
+    def _release(self, route_key, callback):
+        callbacks = self.routes.get(route_key)
+        if callbacks is None:
+            return
+        callbacks.discard(callback)
+        if callbacks:
+            return
+
+        # 마지막 구독자가 떠나면 잠시 후 KIS 구독 해제 (재구독 반복 방지)
+        del self.routes[route_key]
+        if route_key in self.placements and route_key not in self.pending_unsubscribes:
+            self.pending_unsubscribes[route_key] = asyncio.create_task(self._unsubscribe_later(route_key))
+
+    async def _unsubscribe_later(self, route_key):
+        try:
+            await asyncio.sleep(self.unsubscribe_linger)
+        except asyncio.CancelledError:
+            return
 
-    async def broadcast(self, data):
-        for callback in list(self.clients):
+        self.pending_unsubscribes.pop(route_key, None)
+        if route_key in self.routes:
+            return
+        session = self.placements.pop(route_key, None)
+        if session is None:
+            return
+
+        tr_id, tr_key = route_key
+        if tr_id == "H0STCNT0":
+            tick_store.remove("domestic", tr_key)
+            candle_store.remove("domestic", tr_key)
+        elif tr_id == "HDFSCNT0":
+            tick_store.remove("overseas", tr_key[4:]) # D + 거래소(3자리) + 종목코드
+            candle_store.remove("overseas", tr_key[4:])
+
+        try:
+            await session.unsubscribe(route_key)
+            logger.info(f"🔕 Removed subscription: {route_key[1]}. Total: {len(self.placements)}")
+        except Exception as e:
+            logger.warning(f"⚠️ KIS 구독 해제 실패 ({route_key[1]}): {e}")
+
+        # 빈 자리에 등록을 기다리던 종목 등록
+        if self._has_unplaced():
+            placed = await self.place_unplaced()
+            self.notify_status(placed, "connected")
+
+    async def unsubscribe_all(self):
+        for route_key, session in list(self.placements.items()):
+            await session.unsubscribe(route_key)
+
+        self.placements = {}
+
+    async def rebalance(self, session):
+        """재연결 중인 세션의 종목을 여유가 있는 다른 연결된 세션으로 이동 (나머지는 재연결 후 복구)"""
+        moved = []
+        for route_key in list(session.subscribed):
+            targets = [
+                other for other in self.sessions
+                if other is not session and other.is_connected and not other.is_full
+            ]
+            if not targets:
+                break
+            target = min(targets, key=lambda other: other.load)
+            session.subscribed.discard(route_key)
+            self.placements[route_key] = target
             try:
-                await callback(data)
+                await target.subscribe(route_key)
+            except websockets.exceptions.ConnectionClosed:
+                pass
+            moved.append(route_key)
+
+        if moved:
+            logger.info(f"✅ shard {session.shard_id}의 {len(moved)}개 종목을 다른 세션으로 재배치")
+            self.notify_status(moved, "connected")
+
+    def set_status_hook(self, callback, hook):
+        """callback(데이터 수신 콜백)을 등록한 클라이언트에게 연결 상태 메시지를 보낼 함수 등록"""
+        self.status_hooks[callback] = hook
+
+    def notify_status(self, route_keys, state: str):
+        """연결 상태(reconnecting / connected)를 해당 종목을 보고 있는 클라이언트에게 전달"""
+        affected = {}
+        for route_key in route_keys:
+            for callback in self.routes.get(route_key, ()):
+                affected.setdefault(callback, []).append(route_key[1])
+
+        for callback, tr_keys in affected.items():
+            hook = self.status_hooks.get(callback)
+            if hook is None:
+                continue
+            try:
+                hook({"type": "status", "state": state, "items": tr_keys})
+            except Exception:
+                pass
+
+    async def handle_message(self, msg):
+        # JSON 제어 메시지(구독 응답 등)는 파싱하지 않음
+        if not is_data_frame(msg):
+            return
+
+        result = parse_frame(msg, self.exchange_rate)
+        if result is None:
+            return
+        tr_id, records = result
+
+        # 한 프레임에 여러 건이 오면 종목(구독 키)별로 묶어 한 번에 전달
+        # record.key: 국내 종목코드 / 해외 실시간종목코드(RSYM) = 구독 시 tr_key
+        groups = {}
+        for record in records:
+            groups.setdefault(record.key, []).append(record)
+
+        for key, group in groups.items():
+            route_key = (tr_id, key)
+            is_tick = isinstance(group[-1], Tick)
+            if not is_tick and not self.routes.get(route_key):
+                continue
+
+            if is_tick:
+                # 체결 데이터로 현재가 캐시 / 최근 체결 내역 / 분봉 갱신 (구독 중인 종목은 REST 호출 불필요)
+                # 레코드 필드를 직접 읽음 (dict 변환은 클라이언트에 전송할 때만)
+                market = "domestic" if tr_id == "H0STCNT0" else "overseas"
+                quote_cache.apply_tick(market, group[-1].code, group[-1])
+                for tick in group:
+                    tick_store.append_tick(market, tick)
+                    candle_store.append_tick(market, tick)
+            self.dispatch(route_key, group)
+
+    def dispatch(self, route_key, records):
+        """
+        콜백은 클라이언트 송신 큐에 넣기만 함 (전송 대기 X)
+        records: 한 프레임에 온 같은 종목의 파싱된 레코드 (시간순)
+        """
+        callbacks = self.routes.get(route_key)
+        if not callbacks:
+            return
+        # dict 변환/인코딩 결과를 모든 클라이언트가 공유하도록 메시지 객체는 한 번만 생성
+        message = RealtimeMessage(records)
+        for callback in list(callbacks):
+            try:
+                callback(message)
             except:
                 pass
 
+    def get_stats(self):
+        return {
+            "sessions": [session.get_stats() for session in self.sessions],
+            "subscriptions": len(self.placements),
+            "capacity": sum(session.capacity for session in self.sessions),
+            "routes": len(self.routes),
+            "unplaced": sum(1 for route_key in self.routes if route_key not in self.placements),
+            "pending_unsubscribes": len(self.pending_unsubscribes),
+        }
+
 kis_ws_manager = KisWebSocketManager()
\ No newline at end of file
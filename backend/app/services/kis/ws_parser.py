@@ -0,0 +1,214 @@
+"""
+KIS 실시간 웹소켓 데이터 프레임 파서
+프레임 형식: {암호화 여부(0/1)}|{TR ID}|{데이터 건수}|{값1^값2^...} (여러 건이면 값 목록이 건수만큼 이어짐)
+JSON 제어 메시지(구독 응답, PINGPONG)는 '{'로 시작하므로 첫 글자만 보고 구분 (json.loads 시도 없음)
+TR ID별 필드 위치 테이블로 값을 한 번에 꺼내고, dict 대신 튜플 기반 레코드로 보관
+"""
+
+from operator import itemgetter
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from core.decryption import aes_cbc_base64_dec
+
+# --- 레코드 ---
+TICK_KEYS = ("code", "time", "price", "rate", "volume", "amount", "vol", "date", "open", "high", "low", "diff", "strength")
+
+class Tick(NamedTuple):
+    """체결 (H0STCNT0 / HDFSCNT0)"""
+    key: str # 구독 키 (국내 종목코드 / 해외 RSYM)
+    code: str
+    time: str
+    price: str
+    rate: str
+    volume: str
+    amount: str
+    vol: str
+    date: str
+    open: str
+    high: str
+    low: str
+    diff: str
+    strength: str
+
+    def to_dict(self) -> dict:
+        data = dict(zip(TICK_KEYS, self[1:]))
+        data["type"] = "tick"
+        return data
+
+ASK_PRICE_KEYS = tuple(f"ask_price_{i}" for i in range(1, 11))
+BID_PRICE_KEYS = tuple(f"bid_price_{i}" for i in range(1, 11))
+ASK_REMAIN_KEYS = tuple(f"ask_remain_{i}" for i in range(1, 11))
+BID_REMAIN_KEYS = tuple(f"bid_remain_{i}" for i in range(1, 11))
+
+class Ask(NamedTuple):
+    """호가 (H0STASP0 / HDFSASP0), 1~10호가"""
+    key: str
+    code: str
+    time: str
+    ask_prices: Tuple[str, ...]
+    bid_prices: Tuple[str, ...]
+    ask_remains: Tuple[str, ...]
+    bid_remains: Tuple[str, ...]
+
+    def to_dict(self) -> dict:
+        data = {"type": "ask", "code": self.code, "time": self.time}
+        data.update(zip(ASK_PRICE_KEYS, self.ask_prices))
+        data.update(zip(BID_PRICE_KEYS, self.bid_prices))
+        data.update(zip(ASK_REMAIN_KEYS, self.ask_remains))
+        data.update(zip(BID_REMAIN_KEYS, self.bid_remains))
+        return data
+
+Record = Union[Tick, Ask]
+
+# --- TR ID별 필드 위치 테이블 ---
+class TickLayout(NamedTuple):
+    fields: itemgetter # TICK_KEYS 순서
+    width: int # 필요한 최소 값 개수
+    krw_positions: Tuple[int, ...] # 원화로 환산할 필드 (TICK_KEYS 기준 위치)
+
+class AskLayout(NamedTuple):
+    code: int
+    time: int
+    ask_prices: itemgetter
+    bid_prices: itemgetter
+    ask_remains: itemgetter
+    bid_remains: itemgetter
+    width: int
+    to_krw: bool # 호가를 원화로 환산할지 여부
+
+def _tick_layout(indices, krw_keys=()):
+    return TickLayout(
+        fields=itemgetter(*indices),
+        width=max(indices) + 1,
+        krw_positions=tuple(TICK_KEYS.index(key) for key in krw_keys),
+    )
+
+def _ask_layout(code, time, ask_prices, bid_prices, ask_remains, bid_remains, to_krw=False):
+    return AskLayout(
+        code, time,
+        itemgetter(*ask_prices), itemgetter(*bid_prices),
+        itemgetter(*ask_remains), itemgetter(*bid_remains),
+        width=max(*ask_prices, *bid_prices, *ask_remains, *bid_remains) + 1,
+        to_krw=to_krw,
+    )
+
+TICK_LAYOUTS = {
+    # 국내 체결: MKSC_SHRN_ISCD, STCK_CNTG_HOUR, STCK_PRPR, PRDY_CTRT, ACML_VOL, ACML_TR_PBMN, CNTG_VOL, BSOP_DATE, STCK_OPRC, STCK_HGPR, STCK_LWPR, PRDY_VRSS, CTTR
+    "H0STCNT0": _tick_layout((0, 1, 2, 5, 13, 14, 12, 33, 7, 8, 9, 4, 18)),
+    # 해외 체결: SYMB, KHMS, LAST, RATE, TVOL, TAMT, EVOL, KYMD, OPEN, HIGH, LOW, DIFF, STRN (가격은 USD → KRW)
+    "HDFSCNT0": _tick_layout(
+        (1, 7, 11, 14, 20, 21, 19, 6, 8, 9, 10, 13, 24),
+        krw_keys=("price", "amount", "open", "high", "low", "diff"),
+    ),
+}
+
+ASK_LAYOUTS = {
+    # 국내 호가: ASKP1~10, BIDP1~10, ASKP_RSQN1~10, BIDP_RSQN1~10
+    "H0STASP0": _ask_layout(
+        0, 1,
+        ask_prices=range(3, 13), bid_prices=range(13, 23),
+        ask_remains=range(23, 33), bid_remains=range(33, 43),
+    ),
+    # 해외 호가: 호가 단계마다 PBID, PASK, VBID, VASK 순으로 6칸 간격 (가격은 USD → KRW)
+    "HDFSASP0": _ask_layout(
+        1, 6,
+        ask_prices=range(12, 72, 6), bid_prices=range(11, 71, 6),
+        ask_remains=range(14, 74, 6), bid_remains=range(13, 73, 6),
+        to_krw=True,
+    ),
+}
+
+# --- 파서 ---
+def _krw(value: str, exchange_rate: float) -> str:
+    try:
+        return str(int(float(value) * exchange_rate))
+    except ValueError:
+        return "0"
+
+def parse_tick(layout: TickLayout, values, exchange_rate: float) -> Optional[Tick]:
+    if len(values) < layout.width:
+        return None
+    fields = layout.fields(values)
+    if layout.krw_positions:
+        fields = list(fields)
+        try:
+            for pos in layout.krw_positions:
+                fields[pos] = str(int(float(fields[pos]) * exchange_rate))
+        except ValueError:
+            return None
+    return Tick(values[0], *fields)
+
+def parse_ask(layout: AskLayout, values, exchange_rate: float) -> Optional[Ask]:
+    if len(values) < layout.width:
+        return None
+    ask_prices = layout.ask_prices(values)
+    bid_prices = layout.bid_prices(values)
+    if layout.to_krw:
+        ask_prices = tuple(_krw(v, exchange_rate) for v in ask_prices)
+        bid_prices = tuple(_krw(v, exchange_rate) for v in bid_prices)
+    return Ask(
+        values[0], values[layout.code], values[layout.time],
+        ask_prices, bid_prices, layout.ask_remains(values), layout.bid_remains(values),
+    )
+
+def parse_values(tr_id: str, values, exchange_rate: float) -> Optional[Record]:
+    """'^'로 분리된 값 목록 → 레코드 (지원하지 않는 TR ID면 None)"""
+    layout = TICK_LAYOUTS.get(tr_id)
+    if layout is not None:
+        return parse_tick(layout, values, exchange_rate)
+    layout = ASK_LAYOUTS.get(tr_id)
+    if layout is not None:
+        return parse_ask(layout, values, exchange_rate)
+    return None
+
+def is_data_frame(frame) -> bool:
+    """실시간 데이터 프레임(평문 '0' / 암호화 '1') 여부. JSON 제어 메시지는 '{'로 시작"""
+    return isinstance(frame, str) and frame[:1] in ("0", "1")
+
+def is_encrypted_frame(frame) -> bool:
+    return isinstance(frame, str) and frame[:1] == "1"
+
+def decrypt_frame(frame: str, ciphers: Dict[str, Tuple[str, str]]) -> Optional[str]:
+    """
+    암호화 프레임('1'|TR ID|건수|암호문) → 평문 프레임('0'|TR ID|건수|평문)
+    ciphers: TR ID → (key, iv), 구독 응답에서 받은 값. 아주 큰 프레임은 스레드 풀에서 호출
+    """
+    parts = frame.split("|", 3)
+    if len(parts) < 4:
+        return None
+    cipher = ciphers.get(parts[1])
+    if cipher is None:
+        return None
+    key, iv = cipher
+    try:
+        plain = aes_cbc_base64_dec(key, iv, parts[3])
+    except Exception:
+        return None
+    return f"0|{parts[1]}|{parts[2]}|{plain}"
+
+def parse_frame(frame: str, exchange_rate: float) -> Optional[Tuple[str, List[Record]]]:
+    """
+    평문 데이터 프레임 → (TR ID, 레코드 목록)
+    체결이 몰리면 한 프레임에 여러 건이 담겨 옴: parts[2] = 건수, 값 목록을 건수로 나눈 길이가 한 건
+    """
+    parts = frame.split("|", 3)
+    if len(parts) < 4 or parts[0] != "0":
+        return None
+    tr_id = parts[1]
+    values = parts[3].split("^")
+
+    try:
+        count = max(1, int(parts[2]))
+    except ValueError:
+        count = 1
+    width = len(values) // count
+
+    if count == 1:
+        records = [parse_values(tr_id, values, exchange_rate)]
+    else:
+        records = [
+            parse_values(tr_id, values[start:start + width], exchange_rate)
+            for start in range(0, width * count, width)
+        ]
+    records = [record for record in records if record is not None]
+    return (tr_id, records) if records else None
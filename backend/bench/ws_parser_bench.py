@@ -0,0 +1,131 @@
+"""
+KIS 실시간 프레임 파서 마이크로 벤치마크
+사용법 (backend 디렉터리에서): python bench/ws_parser_bench.py [반복 횟수]
+TR ID별로 기존 방식(json.loads 시도 후 dict 생성)과 ws_parser의 초당 처리 프레임 수를 비교
+암호화 프레임은 이벤트 루프에서 직접 복호화하는 경우와 스레드 풀을 거치는 경우를 프레임 크기별로 비교
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from services.kis.ws_parser import TICK_LAYOUTS, ASK_LAYOUTS, TICK_KEYS, is_data_frame, parse_frame, decrypt_frame
+
+EXCHANGE_RATE = 1430.0
+
+SAMPLE_FRAMES = {
+    "H0STCNT0": "0|H0STCNT0|001|" + "^".join(["005930", "093015", "71500"] + [str(100 + i) for i in range(43)]),
+    "H0STASP0": "0|H0STASP0|001|" + "^".join(["005930", "093015", "0"] + [str(71000 + i * 100) for i in range(56)]),
+    "HDFSCNT0": "0|HDFSCNT0|001|" + "^".join(["DNASAAPL", "AAPL", "4"] + [f"{190 + i * 0.01:.4f}" for i in range(23)]),
+    "HDFSASP0": "0|HDFSASP0|001|" + "^".join(["DNASAAPL", "AAPL", "4"] + [f"{190 + i * 0.01:.4f}" for i in range(66)]),
+}
+# 체결이 몰릴 때처럼 한 프레임에 5건 (legacy는 첫 건만 처리하므로 건수 대비 비교)
+SAMPLE_FRAMES["H0STCNT0x5"] = "0|H0STCNT0|005|" + "^".join([SAMPLE_FRAMES["H0STCNT0"].split("|")[3]] * 5)
+
+# 암호화 프레임 (구독 응답으로 받는 key / iv와 같은 형식)
+AES_KEY = "k" * 32
+AES_IV = "i" * 16
+CIPHERS = {"H0STCNT0": (AES_KEY, AES_IV)}
+
+def encrypt_frame(frame: str) -> str:
+    flag, tr_id, count, payload = frame.split("|", 3)
+    cipher = AES.new(AES_KEY.encode("utf-8"), AES.MODE_CBC, AES_IV.encode("utf-8"))
+    encrypted = b64encode(cipher.encrypt(pad(payload.encode("utf-8"), AES.block_size))).decode()
+    return f"1|{tr_id}|{count}|{encrypted}"
+
+def legacy_parse(frame: str):
+    """기존 read_loop 방식: 모든 프레임에 json.loads 시도 → split → 키 문자열로 dict 생성 (첫 건만 처리)"""
+    try:
+        json.loads(frame)
+    except json.JSONDecodeError:
+        pass
+    parts = frame.split("|")
+    tr_id = parts[1]
+    values = parts[3].split("^")
+
+    layout = TICK_LAYOUTS.get(tr_id)
+    if layout is not None:
+        data = {"type": "tick"}
+        for key, value in zip(TICK_KEYS, layout.fields(values)):
+            data[key] = value
+        for pos in layout.krw_positions:
+            key = TICK_KEYS[pos]
+            data[key] = str(int(float(data[key]) * EXCHANGE_RATE))
+        return data
+
+    layout = ASK_LAYOUTS[tr_id]
+    data = {"type": "ask", "code": values[layout.code], "time": values[layout.time]}
+    for prefix, getter in (("ask_price", layout.ask_prices), ("bid_price", layout.bid_prices),
+                           ("ask_remain", layout.ask_remains), ("bid_remain", layout.bid_remains)):
+        for i, value in enumerate(getter(values), start=1):
+            if layout.to_krw and prefix.endswith("price"):
+                try:
+                    value = str(int(float(value) * EXCHANGE_RATE))
+                except ValueError:
+                    value = "0"
+            data[f"{prefix}_{i}"] = value
+    return data
+
+def new_parse(frame: str):
+    if is_data_frame(frame):
+        return parse_frame(frame, EXCHANGE_RATE)
+
+def new_parse_to_dict(frame: str):
+    if is_data_frame(frame):
+        _, records = parse_frame(frame, EXCHANGE_RATE)
+        return [record.to_dict() for record in records]
+
+def bench(func, frame: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(frame)
+    return iterations / (time.perf_counter() - start)
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    print(f"{'TR ID':<10} {'legacy':>14} {'record':>14} {'record+dict':>14}  (frames/sec, {iterations:,}회)")
+    for tr_id, frame in SAMPLE_FRAMES.items():
+        # 결과 동일성 확인
+        assert all(legacy_parse(frame) == data for data in new_parse_to_dict(frame)), tr_id
+
+        legacy = bench(legacy_parse, frame, iterations)
+        record = bench(new_parse, frame, iterations)
+        record_dict = bench(new_parse_to_dict, frame, iterations)
+        print(f"{tr_id:<10} {legacy:>14,.0f} {record:>14,.0f} {record_dict:>14,.0f}")
+
+    bench_encrypted(iterations)
+
+async def bench_decrypt_pool(frame: str, iterations: int) -> float:
+    """큰 프레임의 read_loop 경로: 프레임마다 스레드 풀 복호화를 기다린 뒤 파싱 (한 번에 1건)"""
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            plain = await loop.run_in_executor(executor, decrypt_frame, frame, CIPHERS)
+            parse_frame(plain, EXCHANGE_RATE)
+        return iterations / (time.perf_counter() - start)
+
+def bench_encrypted(iterations: int):
+    frame = encrypt_frame(SAMPLE_FRAMES["H0STCNT0"])
+    assert parse_frame(decrypt_frame(frame, CIPHERS), EXCHANGE_RATE) == parse_frame(SAMPLE_FRAMES["H0STCNT0"], EXCHANGE_RATE)
+
+    print("\n암호화 H0STCNT0 (복호화 + 파싱, frames/sec)")
+    print(f"{'건수':<6} {'bytes':>8} {'inline':>14} {'pool':>14}")
+    payload = SAMPLE_FRAMES["H0STCNT0"].split("|")[3]
+    for count in (1, 20, 100):
+        frame = encrypt_frame(f"0|H0STCNT0|{count:03d}|" + "^".join([payload] * count))
+        inline = bench(lambda f: parse_frame(decrypt_frame(f, CIPHERS), EXCHANGE_RATE), frame, iterations // count)
+        pooled = asyncio.run(bench_decrypt_pool(frame, iterations // count))
+        print(f"{count:<6} {len(frame):>8,} {inline:>14,.0f} {pooled:>14,.0f}")
+
+if __name__ == "__main__":
+    main()